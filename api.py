@@ -0,0 +1,161 @@
+import json
+
+from flask import Blueprint, Response, current_app, request
+
+from extensions import name_index
+from forms import FilterForm
+from models import Venue, Artist, Show
+from search import catalog_filters
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder is the fallback
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# /api/v1/<entity>?fields=id,name&limit=50&after=<cursor> and
+# /api/v1/<entity>/<id>?fields=... Only the requested fields are selected
+# from the database; listings are keyset-paginated on id and return the
+# cursor of the next page (or null on the last one). Venue and artist
+# listings take the same ?genre=, city, state and seeking filters as the
+# pages.
+# /api/v1/<venues|artists>/autocomplete?q=<prefix>&limit=10 feeds the name
+# pickers from the in-memory name index (autocomplete.py).
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'genres': Venue.genres,
+    'website': Venue.website,
+    'facebook_link': Venue.facebook_link,
+    'image_link': Venue.image_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'genres': Artist.genres,
+    'website': Artist.website,
+    'facebook_link': Artist.facebook_link,
+    'image_link': Artist.image_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+}
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'artist_id': Show.artist_id,
+    'venue_id': Show.venue_id,
+    'start_time': Show.start_time,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+}
+
+# model, selectable fields, fields returned when ?fields= is absent
+ENTITIES = {
+    'venues': (Venue, VENUE_FIELDS, ('id', 'name', 'city', 'state')),
+    'artists': (Artist, ARTIST_FIELDS, ('id', 'name', 'city', 'state')),
+    'shows': (Show, SHOW_FIELDS, ('id', 'artist_id', 'venue_id', 'start_time')),
+}
+
+def _default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def json_response(payload, status=200):
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_default)
+    else:
+        body = json.dumps(payload, default=_default, separators=(',', ':'))
+    return Response(body, status=status, mimetype='application/json')
+
+def error(message, status):
+    return json_response({'error': message}, status)
+
+def requested_fields(entity):
+    _, fields, defaults = ENTITIES[entity]
+    names = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    names = names or list(defaults)
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        return None, error(f"unknown fields: {', '.join(unknown)}", 400)
+    return list(dict.fromkeys(names)), None
+
+def projection(entity, names):
+    # id is always selected (cursors and lookups need it); shows join their
+    # artist/venue only when one of their columns was asked for
+    model, fields, _ = ENTITIES[entity]
+    query = model.query.with_entities(model.id.label('_id'), *(fields[name].label(name) for name in names))
+    if entity == 'shows':
+        if any(name.startswith('artist_') and name != 'artist_id' for name in names):
+            query = query.join(Artist, Show.artist_id == Artist.id)
+        if any(name.startswith('venue_') and name != 'venue_id' for name in names):
+            query = query.join(Venue, Show.venue_id == Venue.id)
+    return query
+
+@api.route('/<any(venues, artists, shows):entity>')
+def list_entities(entity):
+    model, _, _ = ENTITIES[entity]
+    names, failure = requested_fields(entity)
+    if failure:
+        return failure
+    limit = min(
+        max(request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int), 1),
+        current_app.config['API_MAX_PAGE_SIZE']
+    )
+
+    query = projection(entity, names)
+    if entity != 'shows':
+        query = query.filter(*catalog_filters(model, FilterForm(request.args, meta={'csrf': False})))
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.filter(model.id > after)
+    # one extra row tells whether there is a next page
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1]._id)
+    return json_response({
+        'data': [{name: getattr(row, name) for name in names} for row in rows],
+        'next_cursor': next_cursor
+    })
+
+@api.route('/<any(venues, artists, shows):entity>/<int:entity_id>')
+def get_entity(entity, entity_id):
+    model, _, _ = ENTITIES[entity]
+    names, failure = requested_fields(entity)
+    if failure:
+        return failure
+    row = projection(entity, names).filter(model.id == entity_id).first()
+    if row is None:
+        return error('not found', 404)
+    return json_response({'data': {name: getattr(row, name) for name in names}})
+
+@api.route('/<any(venues, artists):entity>/autocomplete')
+def autocomplete(entity):
+    model, _, _ = ENTITIES[entity]
+    limit = min(
+        max(request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int), 1),
+        current_app.config['AUTOCOMPLETE_MAX_LIMIT']
+    )
+    matches = name_index.lookup(model, request.args.get('q', ''), limit)
+    return json_response({'data': [{'id': owner_id, 'name': name} for owner_id, name in matches]})
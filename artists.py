@@ -0,0 +1,274 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from extensions import name_index, response_cache
+from conditional import conditional_get
+from forms import ArtistForm, FilterForm
+from helpers import delete_shows, last_modified, page_arg, page_count, page_stamps, show_page
+from models import db, Venue, Artist, Show, ArtistShowStats, load_shows
+from search import catalog_filters, search
+from stats import owner_stats, refresh_show_stats, refresh_stale
+
+artists_bp = Blueprint('artists', __name__)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# the show tiles of the artist page; the show side is read from
+# ix_show_artist_id_start_time alone (see migration 3e1f7a2c9d84)
+ARTIST_SHOW_COLUMNS = (
+  Show.id,
+  Show.venue_id,
+  Venue.name.label('venue_name'),
+  Venue.image_link.label('venue_image_link'),
+  Show.start_time,
+  # fragment keys of the tiles
+  Show.updated_at.label('show_updated_at'),
+  Venue.updated_at.label('venue_updated_at')
+)
+
+def played_venue_ids(artist_id):
+  return [venue_id for venue_id, in
+          db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+def artist_cache_keys(artist_id, venue_ids=None):
+  # cached pages that render this artist: the listings, its own page and
+  # the page of every venue it has played at
+  if venue_ids is None:
+    venue_ids = played_venue_ids(artist_id)
+  return ['artists', 'shows', 'venues', f'artist:{artist_id}'] + [f'venue:{venue_id}' for venue_id in venue_ids]
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+def artist_validator(artist_id):
+  # cheap inputs only: the artist row, its show stats row (brought up to date
+  # if a show has started since it was written) and the shows on the
+  # requested pages, never the whole show history
+  now = datetime.now()
+  refresh_stale(Artist, now, ids=[artist_id])
+  row = db.session.query(
+    Artist.updated_at,
+    ArtistShowStats.upcoming_shows,
+    ArtistShowStats.past_shows,
+    ArtistShowStats.next_show_at,
+    ArtistShowStats.last_show_at,
+    ArtistShowStats.refreshed_at
+  ).outerjoin(ArtistShowStats, ArtistShowStats.artist_id == Artist.id).filter(Artist.id == artist_id).first()
+  if row is None:
+    return None
+  show_updated_at, venue_updated_at = page_stamps(Venue, Show.artist_id == artist_id, now)
+  return tuple(row) + (show_updated_at, venue_updated_at), last_modified(
+    row[0], row[5], show_updated_at, venue_updated_at)
+
+def artists_validator():
+  row = db.session.query(db.func.count(Artist.id), db.func.max(Artist.updated_at)).one()
+  return tuple(row), last_modified(row[1])
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@artists_bp.route('/artists')
+@conditional_get(artists_validator)
+@response_cache.cached('artists')
+def artists():
+  # Querying the database for all artists, narrowed by ?genre=, city,
+  # state and seeking
+  filters = FilterForm(request.args, meta={'csrf': False})
+  artists = Artist.query.with_entities(Artist.id, Artist.name).filter(
+    *catalog_filters(Artist, filters)).all()
+  return render_template('pages/artists.html', artists=artists, filters=filters)
+
+@artists_bp.route('/artists/search', methods=['POST'])
+def search_artists():
+  # ranked, case-insensitive search over artist name, city, state and genres
+  # obtain search term
+  search_term = request.form.get("search_term", '')
+  page = max(request.form.get('page', 1, type=int), 1)
+  per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+  filters = FilterForm(request.form, meta={'csrf': False})
+  # obtain one ranked page of lightweight (id, name, city, state) rows
+  count, artist_query = search(Artist, search_term, per_page, (page - 1) * per_page,
+                               catalog_filters(Artist, filters))
+  # obtain response details
+  response={
+    "count": count,
+    "data": artist_query,
+    "page": page,
+    "pages": max((count + per_page - 1) // per_page, 1)
+  }
+  return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                         filters=filters, search_endpoint='artists.search_artists')
+
+@artists_bp.route('/artists/<int:artist_id>')
+@conditional_get(artist_validator)
+@response_cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+    # counts come from artist_show_stats; read (and, if stale, refresh and
+    # commit) them before loading the artist so it is not expired
+    now = datetime.now()
+    stats = owner_stats(Artist, artist_id, now)
+    # Display the artist page with the given artist_id
+    artist = Artist.query.options(load_shows(Artist, 'noload')).get_or_404(artist_id)
+
+    # split past from upcoming shows in SQL against a single timestamp
+    owner_filter = Show.artist_id == artist_id
+    upcoming_count, past_count = stats.upcoming_shows, stats.past_shows
+    upcoming_page = page_arg('upcoming_page')
+    past_page = page_arg('past_page')
+    # object class to dict
+    artist_data = vars(artist)
+    artist_data['past_shows'] = show_page(ARTIST_SHOW_COLUMNS, Venue, owner_filter, now, False, past_page)
+    artist_data['upcoming_shows'] = show_page(ARTIST_SHOW_COLUMNS, Venue, owner_filter, now, True, upcoming_page)
+    artist_data['past_shows_count'] = past_count
+    artist_data['upcoming_shows_count'] = upcoming_count
+    artist_data['past_page'] = past_page
+    artist_data['upcoming_page'] = upcoming_page
+    artist_data['past_pages'] = page_count(past_count)
+    artist_data['upcoming_pages'] = page_count(upcoming_count)
+
+    return render_template('pages/show_artist.html', artist=artist_data)
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists_bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm(request.form, meta={'csrf': False})
+  return render_template('forms/new_artist.html', form=form)
+
+@artists_bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # track insertion errors
+  insertion_error = False
+
+  # perform form validation
+  form = ArtistForm(request.form, meta={'csrf': False})
+  try:
+    artist = Artist(
+      name=form.name.data,
+      city=form.city.data,
+      state=form.state.data,
+      phone=form.phone.data,
+      genres=form.genres.data,
+      facebook_link=form.facebook_link.data,
+      image_link=form.image_link.data,
+      website=form.website_link.data,
+      seeking_venue=form.seeking_venue.data,
+      seeking_description=form.seeking_description.data
+    )
+
+    # insert form data as a new Artist record in the db
+    db.session.add(artist)
+    db.session.commit()
+    response_cache.invalidate('artists')
+    name_index.add(Artist, artist.id, artist.name)
+  except:
+    current_app.logger.exception('artist insert failed name=%s', form.name.data)
+    insertion_error = True
+    db.session.rollback()
+  finally:
+    db.session.close()
+    
+  if not insertion_error:
+    # on successful db insert, flash success
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    return render_template('pages/home.html')
+  else:
+    # on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Artist could not be listed.')
+
+#  Delete Artist
+#  ----------------------------------------------------------------
+
+@artists_bp.route('/artists/<artist_id>/delete', methods=['POST'])
+def delete_artist(artist_id):
+  try:
+    current_artist = Artist.query.options(load_shows(Artist, 'noload')).get_or_404(artist_id)
+    artist_id = current_artist.id
+    venue_ids = played_venue_ids(artist_id)
+    cache_keys = artist_cache_keys(artist_id, venue_ids)
+    # shows go first, a chunk per transaction that also fixes the stats of
+    # its venues, so a failed delete can simply be retried; the artist
+    # row itself is then one DELETE, and ON DELETE CASCADE takes any show
+    # added meanwhile
+    delete_shows(Artist, artist_id)
+    db.session.delete(current_artist)
+    db.session.flush()
+    # its own stats row goes with it
+    refresh_show_stats(Artist, [artist_id])
+    db.session.commit()
+    response_cache.invalidate(*cache_keys)
+    name_index.remove(Artist, artist_id)
+    flash('The artist has been removed together with all of its shows.')
+    return render_template('pages/home.html')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+#  Update Artist
+#  ----------------------------------------------------------------
+
+@artists_bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  # obtain artist given artist_id
+  artist = Artist.query.options(load_shows(Artist, 'noload')).get_or_404(artist_id)
+  # populate form with fields from artist with ID <artist_id>
+  form = ArtistForm(obj=artist)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@artists_bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # take values from the form submitted, and update existing
+  
+  # track insertion errors
+  insertion_error = False
+
+  # perform form validation
+  form = ArtistForm(request.form, meta={'csrf': False})
+  if not form.validate():
+    # if errors are found, flash error
+    flash(form.errors)
+  else:
+    # if form is validated, proceed. 
+    current_app.logger.debug('artist edit validated artist_id=%s', artist_id)
+    try:
+      # obtain artist
+      artist = Artist.query.options(load_shows(Artist, 'noload')).filter_by(id=artist_id).first()
+
+      # update details
+      artist.name = request.form.get("name")
+      artist.city = request.form.get("city")
+      artist.state = request.form.get("state")
+      artist.phone = request.form.get("phone")
+      artist.genres = request.form.getlist("genres")
+      artist.website = request.form.get("website_link")
+      artist.facebook_link = request.form.get("facebook_link")
+      artist.seeking_venue = True if request.form.get("seeking_venue") == 'y' else False
+      artist.seeking_description = request.form.get("seeking_description")
+      artist.image_link = request.form.get("image_link")
+
+      # commit changes
+      db.session.commit()
+      response_cache.invalidate(*artist_cache_keys(artist_id))
+      name_index.add(Artist, artist_id, artist.name)
+    except:
+      insertion_error = True
+      db.session.rollback()
+    finally:
+      db.session.close()
+
+    if not insertion_error:
+      # on successful db insert, flash success
+      flash('Artist ' + request.form['name'] + ' was successfully updated!')
+      return render_template('pages/home.html')
+    else:
+      # on unsuccessful db insert, flash an error instead.
+      flash('An error occurred. Artist ' + artist.name + ' could not be updated.')
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
@@ -0,0 +1,151 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# Name pickers ask for the venues or artists whose name has a word starting
+# with what was typed. Each worker keeps, per model, a sorted list of
+# (casefolded name suffix starting at a word, id) pairs: a lookup is one
+# bisect to the first key >= prefix and a walk while keys still start with
+# it, a few microseconds without touching the database.
+#
+# The lists are built on first use (or by warm_up() at app creation) and
+# kept current by the create/edit/delete handlers of the worker that made
+# the change. Writes from other workers and the CLI (import, seed) are
+# picked up by a rebuild once AUTOCOMPLETE_REFRESH_SECONDS have passed; it
+# runs in a background thread, one per model at a time, while lookups keep
+# reading the previous list.
+#
+# An index is an immutable (entries, names, built_at) snapshot. Readers
+# take the current one without locking; writers build a modified copy and
+# swap it in under the lock, so a walk never sees a list change under it.
+
+def name_keys(name):
+    # "The Musical Hop" -> {"the musical hop", "musical hop", "hop"}
+    words = (name or '').casefold().split()
+    return {' '.join(words[start:]) for start in range(len(words))}
+
+class NameIndex:
+    def __init__(self, app=None):
+        self.indexes = {}
+        # changes made while a rebuild runs, replayed onto its result
+        self.pending = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        # held by the first build of a model, so concurrent first lookups
+        # wait for it instead of each scanning the table
+        self.build_lock = threading.Lock()
+        self.refresh_seconds = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTOCOMPLETE_REFRESH_SECONDS', 300)
+        self.refresh_seconds = app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+        app.extensions['name_index'] = self
+
+    def build(self, model):
+        with self.lock:
+            self.pending[model] = []
+        try:
+            rows = db.session.query(model.id, model.name).all()
+        except Exception:
+            with self.lock:
+                del self.pending[model]
+            raise
+        names = {owner_id: name for owner_id, name in rows}
+        entries = sorted((key, owner_id) for owner_id, name in rows for key in name_keys(name))
+        with self.lock:
+            for owner_id, name in self.pending.pop(model):
+                self._apply(entries, names, owner_id, name)
+            self.indexes[model] = (entries, names, time.monotonic())
+        return len(names)
+
+    def lookup(self, model, prefix, limit):
+        # up to `limit` (id, name) pairs, ordered by the matching name suffix
+        index = self.indexes.get(model)
+        if index is None:
+            with self.build_lock:
+                if model not in self.indexes:
+                    self.build(model)
+            index = self.indexes[model]
+        elif time.monotonic() - index[2] > self.refresh_seconds:
+            self._refresh(model)
+        prefix = ' '.join((prefix or '').casefold().split())
+        if not prefix:
+            return []
+        entries, names, _ = index
+        matches = {}
+        for position in range(bisect_left(entries, (prefix,)), len(entries)):
+            key, owner_id = entries[position]
+            if not key.startswith(prefix) or len(matches) == limit:
+                break
+            if owner_id not in matches and owner_id in names:
+                matches[owner_id] = names[owner_id]
+        return list(matches.items())
+
+    def _refresh(self, model):
+        # rebuild in the background; the caller keeps the current snapshot
+        with self.lock:
+            if model in self.refreshing:
+                return
+            self.refreshing.add(model)
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self.build(model)
+            except Exception:
+                app.logger.exception('name index rebuild failed model=%s', model.__name__)
+                # try again after another refresh period, not on every lookup
+                with self.lock:
+                    if model in self.indexes:
+                        entries, names, _ = self.indexes[model]
+                        self.indexes[model] = (entries, names, time.monotonic())
+            finally:
+                with self.lock:
+                    self.refreshing.discard(model)
+
+        threading.Thread(target=run, name='name-index-refresh', daemon=True).start()
+
+    def add(self, model, owner_id, name):
+        # index a created venue/artist, or re-index an edited one
+        self._write(model, owner_id, name)
+
+    def remove(self, model, owner_id):
+        self._write(model, owner_id, None)
+
+    def _write(self, model, owner_id, name):
+        with self.lock:
+            if model in self.pending:
+                self.pending[model].append((owner_id, name))
+            if model not in self.indexes:
+                return
+            entries, names, built_at = self.indexes[model]
+            entries, names = list(entries), dict(names)
+            self._apply(entries, names, owner_id, name)
+            self.indexes[model] = (entries, names, built_at)
+
+    @staticmethod
+    def _apply(entries, names, owner_id, name):
+        # replace owner_id's keys in these (private) copies; name None removes it
+        for key in name_keys(names.pop(owner_id, None)):
+            position = bisect_left(entries, (key, owner_id))
+            if position < len(entries) and entries[position] == (key, owner_id):
+                del entries[position]
+        if name is not None:
+            for key in name_keys(name):
+                insort(entries, (key, owner_id))
+            names[owner_id] = name
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
@@ -0,0 +1,259 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# A backend stores bytes under string keys plus integer counters that are
+# never evicted. Both implementations expose get/set/counter/incr so the
+# cache can run against either one unchanged.
+
+class MemoryBackend:
+    # in-process LRU with per-entry TTL; one instance per worker
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    # shared store for multi-worker deployments; ``client`` is anything
+    # with the redis-py get/set/incr API (fakeredis works as a stand-in)
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def make_backend(app, max_entries, prefix='fyyur:'):
+    if app.config['CACHE_BACKEND'] == 'redis':
+        # optional dependency, only needed when the shared store is used
+        import redis
+        return RedisBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']), prefix)
+    return MemoryBackend(max_entries)
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+class ResponseCache:
+    # Caches rendered GET responses per route and entity namespace, e.g.
+    # 'venues' or 'venue:3'. Every namespace has a generation counter in
+    # the backend that is part of each entry key; invalidating a namespace
+    # bumps it, which orphans all of its entries (query string variants
+    # included) on local and shared backends alike. Under @conditional_get
+    # the key also carries the validator's ETag, taken from current database
+    # state: a write made through another worker (whose generation bump a
+    # MemoryBackend never sees) changes the ETag and so misses the old entry.
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.ttl = None
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', None)
+
+        self.enabled = app.config['CACHE_ENABLED']
+        self.ttl = app.config['CACHE_DEFAULT_TTL']
+        self.backend = make_backend(app, app.config['CACHE_MAX_ENTRIES'])
+        app.extensions['response_cache'] = self
+
+    def _generation(self, namespace):
+        return self.backend.counter('gen:' + namespace)
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def cached(self, namespace, ttl=None):
+        # ``namespace`` is formatted with the view arguments,
+        # e.g. @cache.cached('venue:{venue_id}')
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying flashed messages are per-user; never cache them
+                if not self.enabled or request.method != 'GET' or '_flashes' in session:
+                    return view(**kwargs)
+
+                ns = namespace.format(**kwargs)
+                key = 'page:{}:{}:{}:{}'.format(
+                    ns, self._generation(ns), g.get('etag', ''), request.query_string.decode())
+                body = self.backend.get(key)
+                if body is not None:
+                    self._count(hit=True)
+                    response = Response(body, mimetype='text/html')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count(hit=False)
+                response = view(**kwargs)
+                if isinstance(response, str):
+                    response = Response(response, mimetype='text/html')
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, response.get_data(), ttl or self.ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *namespaces):
+        for ns in set(namespaces):
+            self.backend.incr('gen:' + ns)
+
+    def stats(self):
+        with self._stats_lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        self.backend.clear()
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+class FragmentCacheExtension(Extension):
+    # {% fragment 'show-tile:' ~ show.id ~ ':' ~ show.show_updated_at %}...{% endfragment %}
+    # The expression is the fragment's key; it must change whenever the
+    # rendered data does.
+    tags = {'fragment'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        body = parser.parse_statements(['name:endfragment'], drop_needle=True)
+        call = self.call_method('_render', [key])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        return self.environment.fragment_cache.render(key, caller)
+
+
+class FragmentCache:
+    # Caches rendered template fragments (show tiles, venue area blocks) in
+    # a store of the same kind as the response cache. Keys are built from
+    # the data the view already read (ids, updated_at stamps, counts), so a
+    # write anywhere changes the key in every worker and nothing has to be
+    # invalidated; the TTL and max entries only bound memory. A hit is one
+    # backend lookup.
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.ttl = None
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_REDIS_URL', None)
+        app.config.setdefault('CACHE_FRAGMENT_TTL', 3600)
+        app.config.setdefault('CACHE_FRAGMENT_MAX_ENTRIES', 10000)
+
+        self.enabled = app.config['CACHE_ENABLED']
+        self.ttl = app.config['CACHE_FRAGMENT_TTL']
+        self.backend = make_backend(app, app.config['CACHE_FRAGMENT_MAX_ENTRIES'], 'fyyur:fragment:')
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.extend(fragment_cache=self)
+        app.extensions['fragment_cache'] = self
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def render(self, key, caller):
+        if not self.enabled:
+            return caller()
+        full_key = f'frag:{key}'
+        body = self.backend.get(full_key)
+        if body is not None:
+            self._count(hit=True)
+            return Markup(body.decode('utf-8'))
+        self._count(hit=False)
+        body = caller()
+        self.backend.set(full_key, body.encode('utf-8'), self.ttl)
+        return body
+
+    def stats(self):
+        with self._stats_lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        self.backend.clear()
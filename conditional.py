@@ -0,0 +1,52 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import Response, g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# ``validator`` receives the view arguments and returns None (let the view
+# answer, e.g. with a 404) or a (state, last_modified) pair: ``state`` is
+# any repr()-able summary of what the page renders, ``last_modified`` an
+# aware UTC datetime or None. A matching If-None-Match (or, without one,
+# If-Modified-Since) is answered with 304 before the view runs. The ETag is
+# left in g.etag, where ResponseCache.cached makes it part of the entry key,
+# so a cached body is only ever served under the ETag it was rendered for.
+
+def conditional_get(validator):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flashed messages are per-user; never validate them
+            if request.method != 'GET' or '_flashes' in session:
+                return view(**kwargs)
+
+            validated = validator(**kwargs)
+            if validated is None:
+                return view(**kwargs)
+            state, last_modified = validated
+            etag = g.etag = hashlib.sha1(repr(state).encode()).hexdigest()
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                if since is not None and since.tzinfo is None:
+                    since = since.replace(tzinfo=timezone.utc)
+                not_modified = (last_modified is not None and since is not None
+                                and last_modified <= since)
+
+            response = Response(status=304) if not_modified else make_response(view(**kwargs))
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # let browsers and the CDN keep the page but revalidate every time
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
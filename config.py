@@ -7,5 +7,81 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below PostgreSQL's max_connections.
+DB_POOL_SIZE = int(os.environ.get('FYYUR_DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('FYYUR_DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('FYYUR_DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('FYYUR_DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('FYYUR_DB_POOL_PRE_PING', '1') == '1'
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('FYYUR_DB_STATEMENT_TIMEOUT_MS', 5000))
+# Log pool checkouts that had to wait at least this long
+DB_POOL_WAIT_WARN_MS = int(os.environ.get('FYYUR_DB_POOL_WAIT_WARN_MS', 100))
+
+# SQLite (local test runs) keeps SQLAlchemy's own pooling defaults
+SQLALCHEMY_ENGINE_OPTIONS = {} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+    'pool_size': DB_POOL_SIZE,
+    'max_overflow': DB_MAX_OVERFLOW,
+    'pool_timeout': DB_POOL_TIMEOUT,
+    'pool_recycle': DB_POOL_RECYCLE,
+    'pool_pre_ping': DB_POOL_PRE_PING,
+    'connect_args': {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'},
+}
+
+# Statements at least this slow are logged; per-request query counts and
+# DB time are sent as X-DB-* response headers when QUERY_STATS_HEADERS is on
+SLOW_QUERY_MS = int(os.environ.get('FYYUR_SLOW_QUERY_MS', 200))
+QUERY_STATS_HEADERS = DEBUG
+
+# Raise on any lazy load of a relationship a query did not ask for
+STRICT_LOADING = os.environ.get('FYYUR_STRICT_LOADING') == '1'
+
+# Show tiles per page on the venue and artist detail pages
+SHOWS_PER_PAGE = int(os.environ.get('FYYUR_SHOWS_PER_PAGE', 12))
+
+# Results per page on the venue and artist search pages
+SEARCH_RESULTS_PER_PAGE = int(os.environ.get('FYYUR_SEARCH_RESULTS_PER_PAGE', 20))
+
+# Default and maximum number of shows per /shows page
+SHOWS_PAGE_SIZE = int(os.environ.get('FYYUR_SHOWS_PAGE_SIZE', 30))
+SHOWS_MAX_PAGE_SIZE = int(os.environ.get('FYYUR_SHOWS_MAX_PAGE_SIZE', 100))
+
+# Shows deleted per transaction when a venue or artist is removed
+DELETE_CHUNK_SIZE = int(os.environ.get('FYYUR_DELETE_CHUNK_SIZE', 5000))
+
+# Most shows accepted by one /shows/create/batch submission
+SHOW_BATCH_MAX_SHOWS = int(os.environ.get('FYYUR_SHOW_BATCH_MAX_SHOWS', 500))
+
+# Response cache for the listing and detail pages: 'memory' keeps a
+# per-worker LRU, 'redis' shares entries across workers via CACHE_REDIS_URL
+CACHE_ENABLED = os.environ.get('FYYUR_CACHE_ENABLED', '1') == '1'
+CACHE_BACKEND = os.environ.get('FYYUR_CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('FYYUR_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = int(os.environ.get('FYYUR_CACHE_DEFAULT_TTL', 60))
+CACHE_MAX_ENTRIES = int(os.environ.get('FYYUR_CACHE_MAX_ENTRIES', 1024))
+# Rendered show tiles and venue area blocks, in a store of the same kind;
+# keys are built from the rendered rows' ids and updated_at stamps, the
+# same in every worker, so the TTL only bounds memory, not staleness
+CACHE_FRAGMENT_TTL = int(os.environ.get('FYYUR_CACHE_FRAGMENT_TTL', 3600))
+CACHE_FRAGMENT_MAX_ENTRIES = int(os.environ.get('FYYUR_CACHE_FRAGMENT_MAX_ENTRIES', 10000))
+
+# Compiled templates are cached on disk and shared by every worker
+# (default: a per-user directory under the system tmp dir); WARM_STARTUP
+# compiles all of them and configures the mappers when the app is created
+JINJA_BYTECODE_CACHE = os.environ.get('FYYUR_JINJA_BYTECODE_CACHE', '1') == '1'
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('FYYUR_JINJA_BYTECODE_CACHE_DIR') or None
+WARM_STARTUP = os.environ.get('FYYUR_WARM_STARTUP', '0') == '1'
+
+# Name pickers (/api/v1/<entity>/autocomplete): default and maximum
+# matches returned, and how often each worker rebuilds its name index to
+# pick up writes made elsewhere
+AUTOCOMPLETE_LIMIT = int(os.environ.get('FYYUR_AUTOCOMPLETE_LIMIT', 10))
+AUTOCOMPLETE_MAX_LIMIT = int(os.environ.get('FYYUR_AUTOCOMPLETE_MAX_LIMIT', 50))
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.environ.get('FYYUR_AUTOCOMPLETE_REFRESH_SECONDS', 300))
+
+# Default and maximum page size of the /api/v1 listings
+API_PAGE_SIZE = int(os.environ.get('FYYUR_API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('FYYUR_API_MAX_PAGE_SIZE', 500))
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+import click
+from flask.cli import with_appcontext
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+# Rows are read through a server-side cursor (stream_results + yield_per)
+# and encoded one at a time, so memory stays flat however large the
+# tables grow. Column names match what `flask import` reads, so an export
+# can be loaded back as-is.
+
+EXPORT_COLUMNS = {
+    'venues': (
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+        Venue.genres, Venue.image_link, Venue.facebook_link,
+        Venue.website.label('website_link'), Venue.seeking_talent, Venue.seeking_description
+    ),
+    'artists': (
+        Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+        Artist.genres, Artist.image_link, Artist.facebook_link,
+        Artist.website.label('website_link'), Artist.seeking_venue, Artist.seeking_description
+    ),
+    'shows': (
+        Show.id, Show.artist_id, Show.venue_id, Show.start_time
+    ),
+}
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# ShowForm's DateTimeField format, so exported shows re-import cleanly
+START_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def export_rows(entity, batch_size=1000):
+    columns = EXPORT_COLUMNS[entity]
+    query = db.session.query(*columns).order_by(columns[0]).execution_options(
+        stream_results=True).yield_per(batch_size)
+    for row in query:
+        yield row._asdict()
+
+def encode_jsonl(records):
+    for record in records:
+        if 'start_time' in record:
+            record['start_time'] = record['start_time'].strftime(START_TIME_FORMAT)
+        yield json.dumps(record) + '\n'
+
+def encode_csv(records, fieldnames):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for record in records:
+        if 'genres' in record:
+            record['genres'] = ';'.join(record['genres'] or [])
+        if 'start_time' in record:
+            record['start_time'] = record['start_time'].strftime(START_TIME_FORMAT)
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def generate_export(entity, fmt):
+    records = export_rows(entity)
+    if fmt == 'csv':
+        fieldnames = [column.key for column in EXPORT_COLUMNS[entity]]
+        return encode_csv(records, fieldnames)
+    return encode_jsonl(records)
+
+@click.command('export', help='Dump venues, artists or shows as CSV or JSONL.')
+@click.argument('entity', type=click.Choice(list(EXPORT_COLUMNS)))
+@click.option('--format', 'fmt', type=click.Choice(list(MIMETYPES)), default='jsonl', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='Destination file; defaults to stdout.')
+@with_appcontext
+def export_cli(entity, fmt, output):
+    for chunk in generate_export(entity, fmt):
+        output.write(chunk)
@@ -0,0 +1,23 @@
+from flask_moment import Moment
+
+from autocomplete import NameIndex
+from cache import ResponseCache, FragmentCache
+from instrumentation import PoolMetrics, QueryStats
+from metrics import Metrics
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#----------------------------------------------------------------------------#
+
+# Created unbound so the blueprints can use them at import time (e.g.
+# @response_cache.cached); create_app() binds each one with init_app.
+# The database handle, db, lives in models.py; Flask-Migrate is bound
+# by create_app() only for the flask CLI.
+
+moment = Moment()
+pool_metrics = PoolMetrics()
+query_stats = QueryStats()
+metrics = Metrics()
+response_cache = ResponseCache()
+fragment_cache = FragmentCache()
+name_index = NameIndex()
@@ -0,0 +1,29 @@
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# babel and dateutil are imported on first use rather than at app import,
+# so workers (and CLI commands) that never format a date do not pay for them.
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # compiled babel pattern and locale, built once per (format, locale)
+  from babel import Locale
+  from babel.dates import parse_pattern
+  return parse_pattern(DATETIME_FORMATS.get(format, format)), Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # views pass datetime objects; strings are still accepted for callers
+  # that have nothing better
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
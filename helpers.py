@@ -0,0 +1,76 @@
+from datetime import timezone
+
+from flask import current_app, request
+
+from models import db, Venue, Artist, Show
+from stats import STATS, refresh_show_stats
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# Shared by the venue and artist pages: one page of their shows, page
+# arguments, Last-Modified stamps and validator inputs and the chunked
+# show deletes.
+
+def show_page_query(columns, parent, owner_filter, now, upcoming, page):
+  # one page of upcoming (soonest first) or past (latest first) shows,
+  # projected to the given columns
+  query = db.session.query(*columns).select_from(Show).join(parent).filter(owner_filter)
+  if upcoming:
+    query = query.filter(Show.start_time > now).order_by(Show.start_time, Show.id)
+  else:
+    query = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+  per_page = current_app.config['SHOWS_PER_PAGE']
+  return query.limit(per_page).offset((page - 1) * per_page)
+
+def show_page(columns, parent, owner_filter, now, upcoming, page):
+  # the rows of one page, as the show tiles render them
+  return [row._asdict() for row in show_page_query(columns, parent, owner_filter, now, upcoming, page)]
+
+def page_stamps(parent, owner_filter, now):
+  # newest updated_at of the shows on the requested upcoming and past
+  # pages and of their artist/venue; reads at most two pages of rows
+  columns = (Show.updated_at.label('show_updated_at'), parent.updated_at.label('parent_updated_at'))
+  pages = [show_page_query(columns, parent, owner_filter, now, upcoming, page_arg(name)).subquery()
+           for upcoming, name in ((True, 'upcoming_page'), (False, 'past_page'))]
+  rows = db.union_all(*(db.select(page.c.show_updated_at, page.c.parent_updated_at) for page in pages)).subquery()
+  return db.session.query(db.func.max(rows.c.show_updated_at), db.func.max(rows.c.parent_updated_at)).one()
+
+def page_arg(name):
+  # 1-based page number from the query string
+  return max(request.args.get(name, 1, type=int), 1)
+
+def page_count(total):
+  per_page = current_app.config['SHOWS_PER_PAGE']
+  return max((total + per_page - 1) // per_page, 1)
+
+def last_modified(*updated_at, passed=None):
+  # newest of the (UTC) updated_at stamps and the (local) start_time of
+  # the latest show to have moved from upcoming to past
+  stamps = [value.replace(tzinfo=timezone.utc) for value in updated_at if value]
+  if passed is not None:
+    stamps.append(passed.astimezone(timezone.utc))
+  return max(stamps, default=None)
+
+def delete_shows(model, owner_id):
+  # delete one venue's or artist's shows DELETE_CHUNK_SIZE at a time, so no
+  # single statement locks the whole history. Each chunk commits together
+  # with the recomputed stats of the owner and of the artists/venues that
+  # lost those shows: a failure partway leaves correct counts, and running
+  # the delete again picks up where it stopped. Returns the number deleted
+  chunk_size = current_app.config['DELETE_CHUNK_SIZE']
+  other_model = Artist if model is Venue else Venue
+  owner_column, other_column = STATS[model][2], STATS[other_model][2]
+  deleted = 0
+  while True:
+    chunk = db.session.query(Show.id, other_column).filter(
+      owner_column == owner_id).order_by(Show.id).limit(chunk_size).all()
+    if chunk:
+      db.session.execute(Show.__table__.delete().where(Show.id.in_([show_id for show_id, _ in chunk])))
+      refresh_show_stats(other_model, [other_id for _, other_id in chunk])
+      refresh_show_stats(model, [owner_id])
+      db.session.commit()
+    deleted += len(chunk)
+    if len(chunk) < chunk_size:
+      return deleted
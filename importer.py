@@ -0,0 +1,254 @@
+import csv
+import json
+import re
+import time
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+
+from forms import ArtistForm, ShowForm, VenueForm
+from models import db, Venue, Artist, Show, search_text_for
+from stats import refresh_show_stats
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# `flask import venues|artists|shows FILE` streams a CSV or JSONL file in
+# chunks, validates every row with the same form the create pages use and
+# writes each chunk with a single executemany INSERT in one transaction.
+# Columns follow the form field names (website_link, seeking_talent, ...);
+# in CSV files genres are separated by ';' or ','. Show rows reference
+# artists by `artist` (name) or `artist_id` and venues by `venue` (name,
+# optionally narrowed by `venue_city`/`venue_state`) or `venue_id`.
+
+import_cli = AppGroup('import', help='Bulk-load venues, artists and shows from CSV or JSONL files.')
+
+TRUE_VALUES = ('y', 'yes', 'true', 't', '1', 'on')
+
+def read_records(path, fmt):
+    # yields (line number, dict) without loading the whole file
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for line, record in enumerate(csv.DictReader(f), start=2):
+                if record.get('genres'):
+                    record['genres'] = [g.strip() for g in re.split(r'[;,]', record['genres']) if g.strip()]
+                yield line, record
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+def to_formdata(record):
+    formdata = MultiDict()
+    for key, value in record.items():
+        if value is None or value == '':
+            continue
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        elif key.startswith('seeking_') and key != 'seeking_description':
+            # BooleanField only treats a missing key as False
+            if str(value).strip().lower() in TRUE_VALUES or value is True:
+                formdata.add(key, 'y')
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+#----------------------------------------------------------------------------#
+# Row builders.
+#----------------------------------------------------------------------------#
+
+def venue_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data,
+        'search_text': search_text_for(form.name.data, form.city.data, form.state.data, form.genres.data)
+    }
+
+def artist_row(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data,
+        'search_text': search_text_for(form.name.data, form.city.data, form.state.data, form.genres.data)
+    }
+
+def show_row(form):
+    return {
+        'artist_id': int(form.artist_id.data),
+        'venue_id': int(form.venue_id.data),
+        'start_time': form.start_time.data
+    }
+
+def resolve_show_references(records):
+    # Replace artist/venue natural keys with ids for a whole chunk using one
+    # query per table. Returns {line: error} for unresolvable rows.
+    artist_names = {r['artist'] for _, r in records if r.get('artist') and not r.get('artist_id')}
+    venue_names = {r['venue'] for _, r in records if r.get('venue') and not r.get('venue_id')}
+    artist_ids = {int(r['artist_id']) for _, r in records if str(r.get('artist_id') or '').isdigit()}
+    venue_ids = {int(r['venue_id']) for _, r in records if str(r.get('venue_id') or '').isdigit()}
+
+    artists_by_name, known_artists = {}, set()
+    if artist_names or artist_ids:
+        for id, name in db.session.query(Artist.id, Artist.name).filter(
+                db.or_(Artist.name.in_(artist_names), Artist.id.in_(artist_ids))):
+            artists_by_name.setdefault(name, []).append(id)
+            known_artists.add(id)
+
+    venues_by_name, known_venues = {}, set()
+    if venue_names or venue_ids:
+        for id, name, city, state in db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).filter(
+                db.or_(Venue.name.in_(venue_names), Venue.id.in_(venue_ids))):
+            venues_by_name.setdefault(name, []).append((id, city, state))
+            known_venues.add(id)
+
+    errors = {}
+    for line, record in records:
+        if str(record.get('artist_id') or '').isdigit():
+            if int(record['artist_id']) not in known_artists:
+                errors[line] = {'artist_id': ['Unknown artist.']}
+                continue
+        else:
+            matches = artists_by_name.get(record.get('artist'), [])
+            if len(matches) != 1:
+                errors[line] = {'artist': ['Unknown artist.' if not matches else 'Ambiguous artist name.']}
+                continue
+            record['artist_id'] = matches[0]
+
+        if str(record.get('venue_id') or '').isdigit():
+            if int(record['venue_id']) not in known_venues:
+                errors[line] = {'venue_id': ['Unknown venue.']}
+        else:
+            matches = [
+                id for id, city, state in venues_by_name.get(record.get('venue'), [])
+                if record.get('venue_city') in (None, '', city)
+                and record.get('venue_state') in (None, '', state)
+            ]
+            if len(matches) != 1:
+                errors[line] = {'venue': ['Unknown venue.' if not matches else 'Ambiguous venue name.']}
+                continue
+            record['venue_id'] = matches[0]
+    return errors
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+ENTITIES = {
+    'venues': (Venue, VenueForm, venue_row),
+    'artists': (Artist, ArtistForm, artist_row),
+    'shows': (Show, ShowForm, show_row),
+}
+
+def invalidate_cache(entity, rows):
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is None:
+        return
+    if entity == 'shows':
+        response_cache.invalidate(
+            'shows', 'venues',
+            *{f"venue:{row['venue_id']}" for row in rows},
+            *{f"artist:{row['artist_id']}" for row in rows})
+    else:
+        response_cache.invalidate(entity)
+
+def run_import(entity, path, fmt, chunk_size, rejects_path):
+    model, form_class, build_row = ENTITIES[entity]
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    read = inserted = rejected = 0
+    rejects = open(rejects_path, 'w', encoding='utf-8') if rejects_path else None
+    started = time.perf_counter()
+
+    def reject(line, record, errors):
+        nonlocal rejected
+        rejected += 1
+        if rejects:
+            rejects.write(json.dumps({'line': line, 'errors': errors, 'record': record}, default=str) + '\n')
+        elif rejected <= 10:
+            click.echo(f'  line {line}: {errors}', err=True)
+
+    try:
+        for chunk in chunked(read_records(path, fmt), chunk_size):
+            read += len(chunk)
+            errors = resolve_show_references(chunk) if entity == 'shows' else {}
+            rows = []
+            # (line, record) of each built row, to reject them if the insert fails
+            accepted = []
+            for line, record in chunk:
+                if line in errors:
+                    reject(line, record, errors[line])
+                    continue
+                form = form_class(formdata=to_formdata(record), meta={'csrf': False})
+                if form.validate():
+                    rows.append(build_row(form))
+                    accepted.append((line, record))
+                else:
+                    reject(line, record, form.errors)
+
+            if rows:
+                try:
+                    db.session.execute(model.__table__.insert(), rows)
+                    if entity == 'shows':
+                        refresh_show_stats(Venue, [row['venue_id'] for row in rows])
+                        refresh_show_stats(Artist, [row['artist_id'] for row in rows])
+                    db.session.commit()
+                    inserted += len(rows)
+                    invalidate_cache(entity, rows)
+                except Exception as e:
+                    db.session.rollback()
+                    for line, record in accepted:
+                        reject(line, record, {'database': [str(e.__cause__ or e)]})
+    finally:
+        if rejects:
+            rejects.close()
+        db.session.close()
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0
+    click.echo(f'{entity}: read {read}, inserted {inserted}, rejected {rejected} '
+               f'in {elapsed:.2f}s ({rate:.0f} rows/s)')
+    return inserted, rejected
+
+def import_command(entity):
+    @import_cli.command(entity, help=f'Import {entity} from a CSV or JSONL file.')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+                  help='Input format; defaults to the file extension.')
+    @click.option('--chunk-size', default=1000, show_default=True,
+                  help='Rows validated and inserted per transaction.')
+    @click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+                  help='Write rejected rows with their errors to this JSONL file.')
+    def command(path, fmt, chunk_size, rejects_path):
+        run_import(entity, path, fmt, chunk_size, rejects_path)
+    return command
+
+for entity in ENTITIES:
+    import_command(entity)
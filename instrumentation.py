@@ -0,0 +1,246 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool metrics.
+#----------------------------------------------------------------------------#
+
+# PoolMetrics installs a QueuePool subclass of its own as the engine's
+# poolclass. Checkout wait time is measured around QueuePool._do_get and
+# the remaining counters come from pool events registered on that class,
+# so they keep working when the engine recreates its pool. snapshot()
+# returns everything, plus the live size/overflow gauges, for dashboards
+# and for sizing workers * (pool_size + max_overflow) against the
+# server's max_connections.
+
+class PoolMetrics:
+
+    def __init__(self, app=None):
+        self.pool = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_wait = None
+        self.logger = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # must run before db.init_app so the engine is built with our pool
+        app.config.setdefault('DB_POOL_WAIT_WARN_MS', 100)
+        self.slow_wait = app.config['DB_POOL_WAIT_WARN_MS'] / 1000.0
+        self.logger = app.logger
+        app.extensions['pool_metrics'] = self
+
+        # SQLite uses its own single-connection pools; leave those alone
+        if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            return
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('poolclass', self.pool_class())
+
+    def pool_class(self):
+        metrics = self
+
+        class InstrumentedQueuePool(QueuePool):
+            def _do_get(self):
+                metrics.pool = self
+                started = time.perf_counter()
+                try:
+                    return super()._do_get()
+                finally:
+                    metrics.record_wait(time.perf_counter() - started)
+
+        event.listen(InstrumentedQueuePool, 'checkout', self._on_checkout)
+        event.listen(InstrumentedQueuePool, 'checkin', self._on_checkin)
+        event.listen(InstrumentedQueuePool, 'connect', self._on_connect)
+        event.listen(InstrumentedQueuePool, 'invalidate', self._on_invalidate)
+        event.listen(InstrumentedQueuePool, 'soft_invalidate', self._on_invalidate)
+        return InstrumentedQueuePool
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        if self.slow_wait and seconds >= self.slow_wait and self.logger:
+            self.logger.warning('pool checkout waited %.1fms (%s)', seconds * 1000,
+                                self.pool.status() if self.pool else 'no pool')
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = {
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait_count': self.wait_count,
+                'wait_seconds_total': self.wait_total,
+                'wait_seconds_max': self.wait_max,
+            }
+        pool = self.pool
+        if pool is not None:
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            })
+        return stats
+
+#----------------------------------------------------------------------------#
+# Per-request query statistics.
+#----------------------------------------------------------------------------#
+
+# QueryStats hooks cursor execution on every Engine and accumulates, per
+# request, the statement count, the total time spent in the database and
+# the slowest statement. In debug mode the numbers are returned as
+# X-DB-* response headers; statements slower than SLOW_QUERY_MS are
+# logged as one JSON line each through app.logger (error.log outside
+# debug). query_budget() applies the same counting to any block of code,
+# which is what route tests use to pin a maximum number of queries.
+
+class StatementStats:
+    __slots__ = ('count', 'total', 'slowest', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds >= self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+
+
+_captures = threading.local()
+_listening = False
+
+def _active_captures():
+    if not hasattr(_captures, 'stack'):
+        _captures.stack = []
+    return _captures.stack
+
+@contextmanager
+def query_budget(max_queries=None):
+    # with query_budget(2): client.get('/venues')
+    stats = StatementStats()
+    stack = _active_captures()
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        raise AssertionError(
+            f'{stats.count} queries issued, budget is {max_queries}; '
+            f'slowest: {stats.slowest_statement}')
+
+
+class QueryStats:
+
+    def __init__(self, app=None):
+        self.app = None
+        self.slow_query = None
+        self.headers = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _listening
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('QUERY_STATS_HEADERS', app.debug)
+        self.app = app
+        self.slow_query = app.config['SLOW_QUERY_MS'] / 1000.0
+        self.headers = app.config['QUERY_STATS_HEADERS']
+        app.extensions['query_stats'] = self
+
+        # Engine-class listeners see every engine; register them only once
+        if not _listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            _listening = True
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.query_stats = StatementStats()
+
+    def _finish(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        if self.headers:
+            response.headers['X-DB-Queries'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f'{stats.total * 1000:.1f}'
+            response.headers['X-DB-Slowest-Ms'] = f'{stats.slowest * 1000:.1f}'
+        self.app.logger.debug(
+            'request db stats endpoint=%s queries=%d db_ms=%.1f slowest_ms=%.1f',
+            request.endpoint, stats.count, stats.total * 1000, stats.slowest * 1000)
+        return response
+
+    def record(self, statement, seconds):
+        if has_app_context() and 'query_stats' in g:
+            g.query_stats.add(statement, seconds)
+        for stats in _active_captures():
+            stats.add(statement, seconds)
+        if seconds >= self.slow_query:
+            self.app.logger.warning(json.dumps({
+                'event': 'slow_query',
+                'endpoint': request.endpoint if has_request_context() else None,
+                'duration_ms': round(seconds * 1000, 1),
+                'statement': statement[:1000],
+            }))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_started'].pop()
+    query_stats = None
+    if has_app_context():
+        query_stats = current_app.extensions.get('query_stats')
+    if query_stats is not None:
+        query_stats.record(statement, seconds)
+    else:
+        for stats in _active_captures():
+            stats.add(statement, seconds)
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
@@ -0,0 +1,167 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, before_render_template, g, request, template_rendered
+from werkzeug.wsgi import ClosingIterator
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+# Metrics wraps app.wsgi_app in a timing middleware and serves /metrics in
+# the Prometheus text exposition format without a client library. Per
+# endpoint it keeps latency histograms for the whole request, for template
+# rendering (via the before_render_template/template_rendered signals) and
+# for the rest of the view, plus an in-flight gauge. The recording path is
+# a couple of perf_counter() calls, a bisect and one short lock. Values
+# are per process: with several gunicorn workers, scrape each one or sum.
+
+# PoolMetrics.snapshot() keys that only ever grow
+POOL_COUNTERS = {'checkouts', 'checkins', 'connects', 'invalidations', 'wait_count', 'wait_seconds_total'}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+
+    def __init__(self, name, help, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), total, count)
+                      for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            base = ','.join(f'{key}="{value}"' for key, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+class TimingMiddleware:
+
+    def __init__(self, wsgi_app, metrics):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        metrics = self.metrics
+        started = time.perf_counter()
+        status = []
+
+        def timed_start_response(status_line, headers, exc_info=None):
+            status.append(status_line[:3])
+            return start_response(status_line, headers, exc_info)
+
+        def finish():
+            metrics.finish(environ, status[0] if status else '500',
+                           time.perf_counter() - started)
+
+        metrics.start()
+        try:
+            iterable = self.wsgi_app(environ, timed_start_response)
+        except BaseException:
+            finish()
+            raise
+        # recorded when the server closes the body, so streamed responses
+        # are timed to their last byte
+        return ClosingIterator(iterable, finish)
+
+
+class Metrics:
+
+    def __init__(self, app=None):
+        self.app = None
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'fyyur_request_duration_seconds', 'Wall time of the whole request.')
+        self.view_seconds = Histogram(
+            'fyyur_view_duration_seconds', 'Request time outside template rendering.')
+        self.render_seconds = Histogram(
+            'fyyur_template_render_seconds', 'Time spent rendering templates.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.wsgi_app = TimingMiddleware(app.wsgi_app, self)
+        app.before_request(self._tag_endpoint)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.expose)
+        app.extensions['metrics'] = self
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self, environ, status, seconds):
+        with self._lock:
+            self.in_flight -= 1
+        endpoint = environ.get('fyyur.endpoint') or 'unmatched'
+        method = environ.get('REQUEST_METHOD', '')
+        render = environ.get('fyyur.render_seconds', 0.0)
+        self.request_seconds.observe((endpoint, method, status), seconds)
+        self.view_seconds.observe((endpoint, method, status), max(seconds - render, 0.0))
+        if render:
+            self.render_seconds.observe((endpoint,), render)
+
+    def _tag_endpoint(self):
+        request.environ['fyyur.endpoint'] = request.endpoint
+
+    def _render_started(self, sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        started = g.pop('render_started', None)
+        if started is not None:
+            environ = request.environ
+            environ['fyyur.render_seconds'] = (
+                environ.get('fyyur.render_seconds', 0.0) + time.perf_counter() - started)
+
+    def expose(self):
+        lines = ['# HELP fyyur_requests_in_flight Requests currently being served.',
+                 '# TYPE fyyur_requests_in_flight gauge',
+                 f'fyyur_requests_in_flight {self.in_flight}']
+        lines += self.request_seconds.expose(('endpoint', 'method', 'status'))
+        lines += self.view_seconds.expose(('endpoint', 'method', 'status'))
+        lines += self.render_seconds.expose(('endpoint',))
+
+        # counters kept by the other extensions, when they are installed
+        for cache_name in ('response_cache', 'fragment_cache'):
+            cache = self.app.extensions.get(cache_name)
+            if cache is not None:
+                for name, value in cache.stats().items():
+                    lines += [f'# TYPE fyyur_{cache_name}_{name}_total counter',
+                              f'fyyur_{cache_name}_{name}_total {value}']
+        pool_metrics = self.app.extensions.get('pool_metrics')
+        if pool_metrics is not None:
+            for name, value in pool_metrics.snapshot().items():
+                if name in POOL_COUNTERS:
+                    metric = f"fyyur_db_pool_{name.replace('_total', '')}_total"
+                    lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+                else:
+                    lines += [f'# TYPE fyyur_db_pool_{name} gauge', f'fyyur_db_pool_{name} {value}']
+
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
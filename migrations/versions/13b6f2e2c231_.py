@@ -0,0 +1,53 @@
+"""add venue_show_stats and artist_show_stats
+
+Revision ID: 13b6f2e2c231
+Revises: e7f5af4abb0f
+Create Date: 2026-10-18 18:02:41.306518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '13b6f2e2c231'
+down_revision = 'e7f5af4abb0f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for owner in ('venue', 'artist'):
+        table = f'{owner}_show_stats'
+        op.create_table(
+            table,
+            sa.Column(f'{owner}_id', sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows', sa.Integer(), nullable=False),
+            sa.Column('past_shows', sa.Integer(), nullable=False),
+            sa.Column('next_show_at', sa.DateTime(), nullable=True),
+            sa.Column('last_show_at', sa.DateTime(), nullable=True),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint([f'{owner}_id'], [f'{owner}.id'], ondelete='cascade'),
+            sa.PrimaryKeyConstraint(f'{owner}_id')
+        )
+        op.create_index(f'ix_{table}_next_show_at', table, ['next_show_at'], unique=False)
+        # backfill with the same aggregate as stats.compute_show_stats;
+        # start_time is stored as local wall-clock time, like datetime.now()
+        op.execute(
+            f"INSERT INTO {table} ({owner}_id, upcoming_shows, past_shows, next_show_at, "
+            f"last_show_at, refreshed_at) "
+            f"SELECT o.id, "
+            f"count(s.id) FILTER (WHERE s.start_time > localtimestamp), "
+            f"count(s.id) FILTER (WHERE s.start_time <= localtimestamp), "
+            f"min(s.start_time) FILTER (WHERE s.start_time > localtimestamp), "
+            f"max(s.start_time) FILTER (WHERE s.start_time <= localtimestamp), "
+            f"timezone('utc', now()) "
+            f"FROM {owner} o LEFT JOIN show s ON s.{owner}_id = o.id GROUP BY o.id"
+        )
+
+
+def downgrade():
+    for owner in ('artist', 'venue'):
+        table = f'{owner}_show_stats'
+        op.drop_index(f'ix_{table}_next_show_at', table_name=table)
+        op.drop_table(table)
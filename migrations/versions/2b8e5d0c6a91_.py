@@ -0,0 +1,37 @@
+"""add genre and city/state filter indexes to venue and artist
+
+Revision ID: 2b8e5d0c6a91
+Revises: 4f2a9c1d7b3e
+Create Date: 2026-10-18 20:31:55.804127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8e5d0c6a91'
+down_revision = '4f2a9c1d7b3e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            # answers genres @> ARRAY[...] (search.catalog_filters)
+            op.create_index(f'ix_{table}_genres', table, ['genres'],
+                            unique=False, postgresql_using='gin',
+                            postgresql_concurrently=True)
+            op.create_index(f'ix_{table}_lower_city_state', table, [sa.text('lower(city)'), 'state'],
+                            unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artist', 'venue'):
+            op.drop_index(f'ix_{table}_lower_city_state', table_name=table,
+                          postgresql_concurrently=True)
+            op.drop_index(f'ix_{table}_genres', table_name=table,
+                          postgresql_concurrently=True)
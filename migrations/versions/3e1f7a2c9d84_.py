@@ -0,0 +1,43 @@
+"""cover the detail pages' show columns in the per-owner show indexes
+
+Revision ID: 3e1f7a2c9d84
+Revises: 2b8e5d0c6a91
+Create Date: 2026-10-18 21:04:12.518230
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3e1f7a2c9d84'
+down_revision = '2b8e5d0c6a91'
+branch_labels = None
+depends_on = None
+
+# index -> (key columns, included columns before and after this revision)
+INDEXES = {
+    'ix_show_venue_id_start_time': (['venue_id', 'start_time'], ['artist_id'], ['artist_id', 'id', 'updated_at']),
+    'ix_show_artist_id_start_time': (['artist_id', 'start_time'], ['venue_id'], ['venue_id', 'id', 'updated_at']),
+}
+
+
+def rebuild(name, columns, include):
+    # build the replacement next to the old index, then swap names, so the
+    # detail pages are never left without one
+    op.create_index(f'{name}_new', 'show', columns, unique=False,
+                    postgresql_concurrently=True, postgresql_include=include)
+    op.drop_index(name, table_name='show', postgresql_concurrently=True)
+    op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, (columns, _, include) in INDEXES.items():
+            rebuild(name, columns, include)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, (columns, include, _) in INDEXES.items():
+            rebuild(name, columns, include)
@@ -0,0 +1,47 @@
+"""install ON DELETE CASCADE on the show foreign keys
+
+Revision ID: 4f2a9c1d7b3e
+Revises: 13b6f2e2c231
+Create Date: 2026-10-18 19:40:12.518203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c1d7b3e'
+down_revision = '13b6f2e2c231'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 90fc83502c02 recreated these constraints unnamed, and databases built
+    # another way may still carry the original ones without a cascade.
+    # Replace every foreign key on `show`, whatever its name, with named
+    # ON DELETE CASCADE constraints. Venue and artist deletes rely on them
+    # (passive_deletes on the relationships).
+    op.execute(
+        "DO $$ DECLARE c record; BEGIN "
+        "FOR c IN SELECT conname FROM pg_constraint "
+        "WHERE conrelid = 'show'::regclass AND contype = 'f' LOOP "
+        "EXECUTE format('ALTER TABLE show DROP CONSTRAINT %I', c.conname); "
+        "END LOOP; END $$"
+    )
+    for column, table in (('artist_id', 'artist'), ('venue_id', 'venue')):
+        # NOT VALID skips the scan of existing rows while `show` is locked
+        op.execute(
+            f"ALTER TABLE show ADD CONSTRAINT show_{column}_fkey FOREIGN KEY ({column}) "
+            f"REFERENCES {table} (id) ON DELETE CASCADE NOT VALID"
+        )
+    # validate after the commit, under a lock that lets reads and writes through
+    with op.get_context().autocommit_block():
+        for column in ('artist_id', 'venue_id'):
+            op.execute(f"ALTER TABLE show VALIDATE CONSTRAINT show_{column}_fkey")
+
+
+def downgrade():
+    # the cascade is what 90fc83502c02 already asked for; only the names differ
+    for column, table in (('artist_id', 'artist'), ('venue_id', 'venue')):
+        op.drop_constraint(f'show_{column}_fkey', 'show', type_='foreignkey')
+        op.create_foreign_key(None, 'show', table, [column], ['id'], ondelete='cascade')
@@ -0,0 +1,31 @@
+"""drop the backfill server default from updated_at
+
+Revision ID: 5a9d2e4b7c10
+Revises: 3e1f7a2c9d84
+Create Date: 2026-10-18 21:32:48.204615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9d2e4b7c10'
+down_revision = '3e1f7a2c9d84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # e7f5af4abb0f needed the default only to backfill existing rows; the
+    # models set updated_at themselves and declare no server default, so
+    # keeping it would show up as drift in `flask db migrate`
+    for table in ('venue', 'artist', 'show'):
+        op.alter_column(table, 'updated_at', existing_type=sa.DateTime(),
+                        existing_nullable=False, server_default=None)
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.alter_column(table, 'updated_at', existing_type=sa.DateTime(),
+                        existing_nullable=False, server_default=sa.text("timezone('utc', now())"))
@@ -0,0 +1,35 @@
+"""add show access-path indexes
+
+Revision ID: 6c758460782b
+Revises: 90fc83502c02
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6c758460782b'
+down_revision = '90fc83502c02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_include=['artist_id'])
+        op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_include=['venue_id'])
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_start_time_id', table_name='show', postgresql_concurrently=True)
+        op.drop_index('ix_show_artist_id_start_time', table_name='show', postgresql_concurrently=True)
+        op.drop_index('ix_show_venue_id_start_time', table_name='show', postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""add trigram search_text to venue and artist
+
+Revision ID: 8da122ad0add
+Revises: 6c758460782b
+Create Date: 2026-10-18 11:04:52.771930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8da122ad0add'
+down_revision = '6c758460782b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('search_text', sa.Text(), nullable=True))
+        # backfill with the same normalisation as models.sync_search_text
+        op.execute(
+            f"UPDATE {table} SET search_text = lower(concat_ws(' ', name, city, state, "
+            f"array_to_string(genres, ' ')))"
+        )
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            op.create_index(f'ix_{table}_search_text', table, ['search_text'],
+                            unique=False, postgresql_using='gin',
+                            postgresql_ops={'search_text': 'gin_trgm_ops'},
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artist', 'venue'):
+            op.drop_index(f'ix_{table}_search_text', table_name=table,
+                          postgresql_concurrently=True)
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'search_text')
@@ -0,0 +1,29 @@
+"""add updated_at to venue, artist and show
+
+Revision ID: e7f5af4abb0f
+Revises: 8da122ad0add
+Create Date: 2026-10-18 12:21:07.583114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7f5af4abb0f'
+down_revision = '8da122ad0add'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows start out as modified "now"; the application keeps
+    # the column current from then on (5a9d2e4b7c10 drops the default)
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("timezone('utc', now())")))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'updated_at')
@@ -1,4 +1,9 @@
+from datetime import datetime
+
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, noload, raiseload, selectinload
 
 # Initialized without explicit app (Flask instance)
 db = SQLAlchemy()
@@ -22,7 +27,24 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='venue', lazy='joined', cascade='all, delete')
+    # bumped on every write; source of the ETag / Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    # the database deletes the shows (ON DELETE CASCADE, migration 4f2a9c1d7b3e);
+    # the ORM only cascades to shows already loaded in the session
+    shows = db.relationship('Show', backref='venue', lazy='select', cascade='all, delete',
+                            passive_deletes=True)
+    # lowercased name/city/state/genres, kept in sync by sync_search_text
+    search_text = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_venue_search_text', 'search_text', postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        # genre containment (genres @> ARRAY[...]) and city/state filters;
+        # see migration 2b8e5d0c6a91
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venue_lower_city_state', db.text('lower(city)'), 'state'),
+    )
 
 class Artist(db.Model):
     __tablename__ = 'artist'
@@ -38,7 +60,24 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artist', lazy='joined', cascade='all, delete')
+    # bumped on every write; source of the ETag / Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    # the database deletes the shows (ON DELETE CASCADE, migration 4f2a9c1d7b3e);
+    # the ORM only cascades to shows already loaded in the session
+    shows = db.relationship('Show', backref='artist', lazy='select', cascade='all, delete',
+                            passive_deletes=True)
+    # lowercased name/city/state/genres, kept in sync by sync_search_text
+    search_text = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_artist_search_text', 'search_text', postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        # genre containment (genres @> ARRAY[...]) and city/state filters;
+        # see migration 2b8e5d0c6a91
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_lower_city_state', db.text('lower(city)'), 'state'),
+    )
 
 class Show(db.Model):
     __tablename__ = 'show'
@@ -46,4 +85,91 @@ class Show(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='cascade'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='cascade'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    start_time = db.Column(db.DateTime, nullable=False)
+    # bumped on every write; source of the ETag / Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    # Detail pages filter by owner and range over start_time, reading every
+    # show column they render from the index (index-only scans); the /shows
+    # listing walks start_time order. See migrations 6c758460782b and
+    # 3e1f7a2c9d84.
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time',
+                 postgresql_include=['artist_id', 'id', 'updated_at']),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time',
+                 postgresql_include=['venue_id', 'id', 'updated_at']),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
+class ShowStatsMixin:
+    # Denormalized show counts for one venue or artist, maintained by
+    # stats.py. The upcoming/past split is as of refreshed_at; once
+    # next_show_at has passed the row is stale and is recomputed on read.
+    upcoming_shows = db.Column(db.Integer, nullable=False, default=0)
+    past_shows = db.Column(db.Integer, nullable=False, default=0)
+    next_show_at = db.Column(db.DateTime)
+    last_show_at = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class VenueShowStats(ShowStatsMixin, db.Model):
+    __tablename__ = 'venue_show_stats'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='cascade'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_venue_show_stats_next_show_at', 'next_show_at'),
+    )
+
+class ArtistShowStats(ShowStatsMixin, db.Model):
+    __tablename__ = 'artist_show_stats'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='cascade'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_artist_show_stats_next_show_at', 'next_show_at'),
+    )
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+@event.listens_for(Artist, 'before_insert')
+@event.listens_for(Artist, 'before_update')
+def sync_search_text(mapper, connection, target):
+    target.search_text = search_text_for(target.name, target.city, target.state, target.genres)
+
+def search_text_for(name, city, state, genres):
+    # shared with Core bulk inserts, which bypass the ORM events
+    parts = [name, city, state] + list(genres or [])
+    return ' '.join(part for part in parts if part).lower()
+
+#----------------------------------------------------------------------------#
+# Loading profiles.
+#----------------------------------------------------------------------------#
+
+# Relationships load lazily by default; each view opts into the strategy
+# it actually needs for Venue.shows / Artist.shows.
+SHOW_LOADERS = {
+    'noload': noload,
+    'selectin': selectinload,
+    'joined': joinedload,
+    'raiseload': raiseload,
+}
+
+def load_shows(model, strategy):
+    # With STRICT_LOADING on, 'noload' becomes 'raiseload' so a view that
+    # touches shows it promised not to need fails instead of returning []
+    if strategy == 'noload' and current_app.config.get('STRICT_LOADING'):
+        strategy = 'raiseload'
+    return SHOW_LOADERS[strategy](model.shows)
+
+@event.listens_for(Session, 'do_orm_execute')
+def strict_loading(orm_execute_state):
+    # With STRICT_LOADING on, every ORM query loads its relationships with
+    # raiseload('*') unless it asked for a strategy (load_shows and other
+    # explicit options are more specific and win): any lazy load that would
+    # emit SQL, e.g. Venue.shows or Show.artist, raises instead
+    if (orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+            and has_app_context() and current_app.config.get('STRICT_LOADING')):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*', sql_only=True))
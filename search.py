@@ -0,0 +1,69 @@
+from difflib import SequenceMatcher
+
+from models import db, Venue
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist both keep a lowercased ``search_text`` column (name,
+# city, state and genres) in sync on write. On PostgreSQL it carries a
+# pg_trgm GIN index, so the ILIKE filters below are index scans and
+# results are ranked by trigram word similarity to the name. Other
+# dialects (SQLite in tests) rank the matching rows in process instead.
+
+def _contains(word):
+  # escape LIKE wildcards so user input is matched literally
+  word = word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  return f'%{word}%'
+
+def search(model, term, limit, offset=0, criteria=()):
+  # returns (total matches, one page of (id, name, city, state) rows);
+  # criteria (see catalog_filters) narrow the matches further
+  term = (term or '').strip().lower()
+  query = db.session.query(model.id, model.name, model.city, model.state).filter(*criteria)
+  for word in term.split():
+    query = query.filter(model.search_text.ilike(_contains(word), escape='\\'))
+
+  if db.engine.dialect.name != 'postgresql':
+    rows = query.all()
+    rows.sort(key=lambda row: (
+      -SequenceMatcher(None, term, (row.name or '').lower()).ratio(),
+      row.name or '',
+      row.id
+    ))
+    return len(rows), rows[offset:offset + limit]
+
+  total = query.order_by(None).count()
+  rows = query.order_by(
+    db.func.word_similarity(term, model.name).desc(),
+    model.name,
+    model.id
+  ).limit(limit).offset(offset).all()
+  return total, rows
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# Filters shared by the listing and search pages. A venue or artist must
+# have every chosen genre: `genres @> ARRAY[...]` on PostgreSQL, answered
+# from the GIN index on genres. City is matched case-insensitively
+# against the lower(city), state index. See migration 2b8e5d0c6a91.
+
+def catalog_filters(model, form):
+  criteria = []
+  if form.genre.data:
+    # db.ARRAY is the generic type, which has no contains(); the list is
+    # bound as the column's type (varchar[]), so the GIN index applies
+    criteria.append(model.genres.op('@>')(form.genre.data))
+  city = (form.city.data or '').strip()
+  if city:
+    criteria.append(db.func.lower(model.city) == city.lower())
+  if form.state.data:
+    criteria.append(model.state == form.state.data)
+  if form.seeking.data:
+    # venues seeking talent, artists seeking a venue
+    seeking = model.seeking_talent if model is Venue else model.seeking_venue
+    criteria.append(seeking.is_(True))
+  return criteria
@@ -0,0 +1,130 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from forms import GENRE_CHOICES
+from models import db, Venue, Artist, Show, VenueShowStats, ArtistShowStats, search_text_for
+from stats import reconcile_show_stats
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#----------------------------------------------------------------------------#
+
+# `flask seed --shows 100000` fills the database with a realistic-looking
+# catalog for benchmarks: venues and artists spread over a set of cities
+# with one to three genres each, and shows spread from two years in the
+# past to one year ahead. Rows are written with batched Core inserts, so
+# a million shows load in minutes. The same --random-seed always produces
+# the same data.
+
+GENRES = [value for value, _ in GENRE_CHOICES]
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('Oakland', 'CA'),
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Chicago', 'IL'),
+    ('Austin', 'TX'), ('Houston', 'TX'), ('Nashville', 'TN'),
+    ('Seattle', 'WA'), ('Portland', 'OR'), ('Denver', 'CO'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Boston', 'MA'),
+    ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Philadelphia', 'PA'),
+]
+
+VENUE_WORDS = (
+    ['The Musical', 'The Dueling', 'The Blue', 'The Velvet', 'Park Square', 'Old Town',
+     'The Golden', 'Red Rock', 'The Copper', 'Union'],
+    ['Hop', 'Pianos Bar', 'Room', 'Lounge', 'Live Music & Coffee', 'Theatre',
+     'Hall', 'Ballroom', 'Club', 'Warehouse'],
+)
+
+ARTIST_WORDS = (
+    ['Guns', 'The Wild', 'Matt', 'Midnight', 'Electric', 'Silver', 'Lonely',
+     'Velvet', 'Static', 'Northern'],
+    ['N Petals', 'Sax Band', 'Quevedo', 'Riders', 'Owls', 'Machines', 'Hearts',
+     'Collective', 'Echoes', 'Lights'],
+)
+
+def _insert(model, rows):
+    db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def _profile(rng, index, words):
+    city, state = rng.choice(CITIES)
+    genres = rng.sample(GENRES, rng.randint(1, 3))
+    name = f'{rng.choice(words[0])} {rng.choice(words[1])} {index}'
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+        'genres': genres,
+        'website': f'https://www.example.com/{index}',
+        'facebook_link': f'https://www.facebook.com/{index}',
+        'image_link': f'https://picsum.photos/seed/{index}/300/300',
+        'seeking_description': 'Looking for new collaborations.',
+        'search_text': search_text_for(name, city, state, genres),
+    }
+
+def seed_catalog(shows, venues=None, artists=None, batch_size=5000, random_seed=1):
+    rng = random.Random(random_seed)
+    venues = venues or max(shows // 50, 10)
+    artists = artists or max(shows // 20, 10)
+    started = time.perf_counter()
+
+    venue_ids_before = db.session.query(db.func.coalesce(db.func.max(Venue.id), 0)).scalar()
+    for offset in range(0, venues, batch_size):
+        rows = []
+        for index in range(offset, min(offset + batch_size, venues)):
+            row = _profile(rng, venue_ids_before + index + 1, VENUE_WORDS)
+            row['address'] = f'{rng.randint(1, 2000)} Main Street'
+            row['seeking_talent'] = rng.random() < 0.3
+            rows.append(row)
+        _insert(Venue, rows)
+
+    artist_ids_before = db.session.query(db.func.coalesce(db.func.max(Artist.id), 0)).scalar()
+    for offset in range(0, artists, batch_size):
+        rows = []
+        for index in range(offset, min(offset + batch_size, artists)):
+            row = _profile(rng, artist_ids_before + index + 1, ARTIST_WORDS)
+            row['seeking_venue'] = rng.random() < 0.3
+            rows.append(row)
+        _insert(Artist, rows)
+
+    venue_ids = [id for id, in db.session.query(Venue.id)]
+    artist_ids = [id for id, in db.session.query(Artist.id)]
+    # two years of history and one year of upcoming shows, at evening hours
+    first_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=730)
+    for offset in range(0, shows, batch_size):
+        rows = [{
+            'venue_id': rng.choice(venue_ids),
+            'artist_id': rng.choice(artist_ids),
+            'start_time': first_day + timedelta(days=rng.randint(0, 1095),
+                                                hours=rng.randint(18, 23),
+                                                minutes=rng.choice((0, 15, 30, 45))),
+        } for _ in range(offset, min(offset + batch_size, shows))]
+        _insert(Show, rows)
+
+    reconcile_show_stats(Venue)
+    reconcile_show_stats(Artist)
+    return venues, artists, shows, time.perf_counter() - started
+
+@click.command('seed', help='Generate synthetic venues, artists and shows.')
+@click.option('--shows', default=1000, show_default=True, help='Number of shows (1k to 1M).')
+@click.option('--venues', type=int, help='Number of venues; defaults to shows / 50.')
+@click.option('--artists', type=int, help='Number of artists; defaults to shows / 20.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--random-seed', default=1, show_default=True)
+@click.option('--reset', is_flag=True, help='Delete all existing shows, venues and artists first.')
+@with_appcontext
+def seed_cli(shows, venues, artists, batch_size, random_seed, reset):
+    if reset:
+        click.confirm('Delete every show, venue and artist?', abort=True)
+        db.session.execute(VenueShowStats.__table__.delete())
+        db.session.execute(ArtistShowStats.__table__.delete())
+        db.session.execute(Show.__table__.delete())
+        db.session.execute(Venue.__table__.delete())
+        db.session.execute(Artist.__table__.delete())
+        db.session.commit()
+    venues, artists, shows, elapsed = seed_catalog(shows, venues, artists, batch_size, random_seed)
+    click.echo(f'seeded {venues} venues, {artists} artists and {shows} shows in {elapsed:.1f}s')
@@ -0,0 +1,294 @@
+import logging
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, render_template, request
+
+from extensions import response_cache
+from conditional import conditional_get
+from forms import ShowForm, ShowBatchForm
+from helpers import last_modified
+from models import db, Venue, Artist, Show
+from stats import record_show, refresh_show_stats
+
+shows_bp = Blueprint('shows', __name__)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# the tiles of the /shows page: a single joined projection of only the
+# columns they render
+SHOW_LISTING_COLUMNS = (
+  Show.id,
+  Show.venue_id,
+  Venue.name.label('venue_name'),
+  Show.artist_id,
+  Artist.name.label('artist_name'),
+  Artist.image_link.label('artist_image_link'),
+  Show.start_time,
+  # fragment keys of the tiles
+  Show.updated_at.label('show_updated_at'),
+  Artist.updated_at.label('artist_updated_at'),
+  Venue.updated_at.label('venue_updated_at')
+)
+
+def parse_show_cursor(value):
+  # "<start_time isoformat>,<show id>" -> (datetime, int), None if malformed
+  try:
+    start_time, show_id = value.rsplit(',', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+  except (AttributeError, ValueError):
+    return None
+
+def show_listing(*columns):
+  # (query, per_page, scope) for the /shows page described by the request
+  # args; keyset over (start_time, id), upcoming shows by default,
+  # ?scope=all to walk the full history from the first show
+  scope = 'all' if request.args.get('scope') == 'all' else 'upcoming'
+  per_page = min(
+    max(request.args.get('per_page', current_app.config['SHOWS_PAGE_SIZE'], type=int), 1),
+    current_app.config['SHOWS_MAX_PAGE_SIZE']
+  )
+  query = db.session.query(*columns).select_from(Show).join(
+    Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+
+  if scope == 'upcoming':
+    query = query.filter(Show.start_time > datetime.now())
+
+  # resume strictly after the last (start_time, id) of the previous page
+  cursor = parse_show_cursor(request.args.get('after'))
+  if cursor:
+    query = query.filter(db.tuple_(Show.start_time, Show.id) > db.tuple_(*cursor))
+
+  # one extra row tells whether there is a next page
+  query = query.order_by(Show.start_time, Show.id).limit(per_page + 1)
+  return query, per_page, scope
+
+def matched_shows(rows):
+  # rows are (line, artist_id, venue_id, start_time). Returns, per line and
+  # per show already booked at the same venue and time, (line, artist id,
+  # venue id, show id), with None for an artist, venue or show not found.
+  # On PostgreSQL one query joins the rows, as a VALUES list, to artist,
+  # venue and show
+  if db.engine.dialect.name != 'postgresql':
+    # VALUES with column aliases is PostgreSQL syntax; elsewhere (SQLite
+    # test runs) three IN queries find the same rows
+    artist_ids = {artist_id for artist_id, in db.session.query(Artist.id).filter(
+      Artist.id.in_({row[1] for row in rows}))}
+    venue_ids = {venue_id for venue_id, in db.session.query(Venue.id).filter(
+      Venue.id.in_({row[2] for row in rows}))}
+    booked = {}
+    for show_id, venue_id, start_time in db.session.query(Show.id, Show.venue_id, Show.start_time).filter(
+        db.tuple_(Show.venue_id, Show.start_time).in_({(row[2], row[3]) for row in rows})).order_by(Show.id):
+      booked.setdefault((venue_id, start_time), []).append(show_id)
+    return [(line,
+             artist_id if artist_id in artist_ids else None,
+             venue_id if venue_id in venue_ids else None,
+             show_id)
+            for line, artist_id, venue_id, start_time in sorted(rows)
+            for show_id in booked.get((venue_id, start_time), [None])]
+
+  batch = db.values(
+    db.column('line', db.Integer),
+    db.column('artist_id', db.Integer),
+    db.column('venue_id', db.Integer),
+    db.column('start_time', db.DateTime),
+    name='batch'
+  ).data(rows)
+  return db.session.query(
+    batch.c.line,
+    Artist.id,
+    Venue.id,
+    Show.id
+  ).select_from(batch).outerjoin(
+    Artist, Artist.id == batch.c.artist_id
+  ).outerjoin(
+    Venue, Venue.id == batch.c.venue_id
+  ).outerjoin(
+    Show, db.and_(Show.venue_id == batch.c.venue_id, Show.start_time == batch.c.start_time)
+  ).order_by(batch.c.line, Show.id).all()
+
+def check_shows(rows):
+  # rows are (line, artist_id, venue_id, start_time); returns a (line,
+  # message) pair per problem found: a missing artist or venue, a show
+  # already booked at the same venue and time, or a double booking within
+  # the rows themselves
+  by_line = {row[0]: row for row in rows}
+  # a line matching several booked shows comes back once per show; the
+  # dict keeps each message once
+  errors = {}
+  for line, artist_id, venue_id, show_id in matched_shows(rows):
+    _, wanted_artist_id, wanted_venue_id, start_time = by_line[line]
+    if artist_id is None:
+      errors[line, f'there is no artist {wanted_artist_id}'] = None
+    if venue_id is None:
+      errors[line, f'there is no venue {wanted_venue_id}'] = None
+    if show_id is not None:
+      errors[line, f'venue {wanted_venue_id} already has show {show_id} at {start_time}'] = None
+
+  # the batch must not double-book a venue on its own either
+  booked = {}
+  for line, artist_id, venue_id, start_time in rows:
+    if (venue_id, start_time) in booked:
+      errors[line, f'venue {venue_id} is already booked at {start_time} on line {booked[venue_id, start_time]}'] = None
+    booked.setdefault((venue_id, start_time), line)
+  return sorted(errors)
+
+def insert_shows(rows):
+  # one multi-row INSERT in the caller's transaction, then the stats rows
+  # of every venue and artist involved are recomputed
+  db.session.execute(Show.__table__.insert().values([{
+    'artist_id': artist_id,
+    'venue_id': venue_id,
+    'start_time': start_time,
+  } for _, artist_id, venue_id, start_time in rows]))
+  venue_ids = {venue_id for _, _, venue_id, _ in rows}
+  artist_ids = {artist_id for _, artist_id, _, _ in rows}
+  refresh_show_stats(Venue, venue_ids)
+  refresh_show_stats(Artist, artist_ids)
+  return (['shows', 'venues'] + [f'venue:{venue_id}' for venue_id in venue_ids]
+          + [f'artist:{artist_id}' for artist_id in artist_ids])
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+def shows_validator():
+  # summarise only the rows of the requested page window
+  query, per_page, scope = show_listing(
+    Show.id,
+    Show.updated_at.label('show_updated_at'),
+    Venue.updated_at.label('venue_updated_at'),
+    Artist.updated_at.label('artist_updated_at')
+  )
+  window = query.subquery()
+  row = db.session.query(
+    db.func.count(window.c.id),
+    db.func.sum(window.c.id),
+    db.func.max(window.c.show_updated_at),
+    db.func.max(window.c.venue_updated_at),
+    db.func.max(window.c.artist_updated_at)
+  ).one()
+  passed = None
+  if scope == 'upcoming':
+    passed = db.session.query(db.func.max(Show.start_time)).filter(
+      Show.start_time <= datetime.now()).scalar()
+  return tuple(row), last_modified(row[2], row[3], row[4], passed=passed)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@shows_bp.route('/shows')
+@conditional_get(shows_validator)
+@response_cache.cached('shows')
+def shows():
+    query, per_page, scope = show_listing(*SHOW_LISTING_COLUMNS)
+
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = f'{last.start_time.isoformat()},{last.id}'
+
+    if current_app.logger.isEnabledFor(logging.DEBUG):
+        for row in rows:
+            current_app.logger.debug('show listing row id=%s venue_id=%s artist_id=%s',
+                             row.id, row.venue_id, row.artist_id)
+
+    data = [row._asdict() for row in rows]
+    return render_template('pages/shows.html', shows=data, scope=scope,
+                           per_page=per_page, next_cursor=next_cursor)
+
+#  Create Show
+#  ----------------------------------------------------------------
+
+@shows_bp.route('/shows/create')
+def create_shows():
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@shows_bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # track insertion errors
+    insertion_error = False
+
+    form = ShowForm(request.form, meta={'csrf': False})
+    # the same checks as a batch of one show
+    artist_id, venue_id = str(form.artist_id.data or ''), str(form.venue_id.data or '')
+    if not (artist_id.isdigit() and venue_id.isdigit()
+            and max(int(artist_id), int(venue_id)) <= ShowBatchForm.MAX_ID):
+      errors = ['artist and venue ids must be numbers']
+    elif form.start_time.data is None:
+      errors = ['start time must look like YYYY-MM-DD HH:MM']
+    else:
+      errors = [message for _, message in
+                check_shows([(1, int(artist_id), int(venue_id), form.start_time.data)])]
+    if errors:
+      for message in errors:
+        flash('Show could not be listed: ' + message)
+      return render_template('forms/new_show.html', form=form)
+
+    try:
+      show = Show(
+        artist_id = form.artist_id.data,
+        venue_id = form.venue_id.data,
+        start_time = form.start_time.data
+      )
+      db.session.add(show)
+      db.session.flush()
+      record_show(show.venue_id, show.artist_id, show.start_time)
+      db.session.commit()
+      response_cache.invalidate('shows', 'venues', f'venue:{show.venue_id}', f'artist:{show.artist_id}')
+    except:
+      current_app.logger.exception('show insert failed artist_id=%s venue_id=%s', form.artist_id.data, form.venue_id.data)
+      insertion_error = True
+      db.session.rollback()
+    finally:
+      db.session.close()
+
+    if not insertion_error:
+      flash('Show was successfully listed!')
+      return render_template('pages/home.html')
+    else:
+      flash('An error occurred. Show could not be listed.')
+      return render_template('pages/home.html')
+
+@shows_bp.route('/shows/create/batch')
+def create_shows_batch():
+  form = ShowBatchForm()
+  return render_template('forms/new_shows_batch.html', form=form)
+
+@shows_bp.route('/shows/create/batch', methods=['POST'])
+def create_shows_batch_submission():
+    form = ShowBatchForm(request.form, meta={'csrf': False})
+    if form.validate():
+      max_shows = current_app.config['SHOW_BATCH_MAX_SHOWS']
+      if len(form.rows) > max_shows:
+        form.shows.errors.append(f'at most {max_shows} shows can be listed at once')
+      else:
+        form.shows.errors.extend(f'line {line}: {message}' for line, message in check_shows(form.rows))
+    if form.shows.errors:
+      # nothing is inserted unless every line is valid
+      return render_template('forms/new_shows_batch.html', form=form)
+
+    # track insertion errors
+    insertion_error = False
+
+    try:
+      cache_keys = insert_shows(form.rows)
+      db.session.commit()
+      response_cache.invalidate(*cache_keys)
+    except:
+      current_app.logger.exception('show batch insert failed shows=%s', len(form.rows))
+      insertion_error = True
+      db.session.rollback()
+    finally:
+      db.session.close()
+
+    if not insertion_error:
+      flash(f'{len(form.rows)} shows were successfully listed!')
+    else:
+      flash('An error occurred. The shows could not be listed.')
+    return render_template('pages/home.html')
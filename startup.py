@@ -0,0 +1,49 @@
+import time
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+
+from models import Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Startup.
+#----------------------------------------------------------------------------#
+
+# Jinja compiles a template to Python source and then to a code object the
+# first time it is rendered, in every worker. With a filesystem bytecode
+# cache the code objects are written once (keyed by template name and
+# source checksum, so edited templates recompile) and later workers only
+# unmarshal them. warm_up() does the remaining first-request work at app
+# creation instead: it loads every template, configures the SQLAlchemy
+# mappers and builds the autocomplete name index, so the first request a
+# new worker serves is not the slow one.
+
+TEMPLATE_EXTENSIONS = ('html',)
+
+def configure_templates(app):
+    app.config.setdefault('JINJA_BYTECODE_CACHE', True)
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', None)
+    if app.config['JINJA_BYTECODE_CACHE']:
+        # None lets jinja pick a per-user directory under the system tmp dir
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
+def warm_up(app):
+    started = time.perf_counter()
+    templates = app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS)
+    for name in templates:
+        app.jinja_env.get_template(name)
+    configure_mappers()
+    names = 0
+    name_index = app.extensions.get('name_index')
+    if name_index is not None:
+        # a database that is down or not migrated yet must not stop the
+        # worker from booting; the index is then built on first use
+        with app.app_context():
+            try:
+                names = name_index.build(Venue) + name_index.build(Artist)
+            except SQLAlchemyError:
+                app.logger.warning('warm startup: name index not built', exc_info=True)
+                name_index.clear()
+    app.logger.info('warm startup: %d templates compiled, mappers configured, %d names indexed in %.1fms',
+                    len(templates), names, (time.perf_counter() - started) * 1000)
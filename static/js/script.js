@@ -2,3 +2,31 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Name pickers: suggestions come from the autocomplete endpoint as
+// "Name (#id)"; picking one copies the id into the target field.
+document.querySelectorAll('[data-autocomplete]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var target = document.getElementById(input.getAttribute('data-target'));
+  var pending = null;
+  input.addEventListener('input', function () {
+    var picked = /\(#(\d+)\)$/.exec(input.value);
+    if (picked) {
+      target.value = picked[1];
+      return;
+    }
+    clearTimeout(pending);
+    pending = setTimeout(function () {
+      fetch(input.getAttribute('data-autocomplete') + '?q=' + encodeURIComponent(input.value))
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          list.innerHTML = '';
+          body.data.forEach(function (match) {
+            var option = document.createElement('option');
+            option.value = match.name + ' (#' + match.id + ')';
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
@@ -0,0 +1,185 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, Artist, Show, VenueShowStats, ArtistShowStats
+
+#----------------------------------------------------------------------------#
+# Show statistics.
+#----------------------------------------------------------------------------#
+
+# venue_show_stats and artist_show_stats hold, per owner, the upcoming and
+# past show counts and the next and last show times, so the listings and
+# detail pages read one row instead of aggregating `show`.
+#
+# - creating a show bumps both owners' rows in the same transaction
+#   (record_show); deletes and bulk imports recompute the affected rows
+#   from `show` (refresh_show_stats)
+# - a row whose next_show_at has passed no longer splits upcoming from
+#   past correctly; readers recompute such rows first (refresh_stale,
+#   owner_stats). This is the one write GET handlers make: the alternative
+#   is aggregating `show` on every read. It is a single upsert, so readers
+#   refreshing the same row at once (e.g. the first hits on a new venue,
+#   which has no row yet) both succeed instead of one hitting a unique
+#   violation between a DELETE and an INSERT
+# - `flask stats reconcile` recomputes every row, to repair drift from
+#   writes that bypass the app
+
+# owner model -> (stats model, stats key column, show owner column)
+STATS = {
+    Venue: (VenueShowStats, VenueShowStats.venue_id, Show.venue_id),
+    Artist: (ArtistShowStats, ArtistShowStats.artist_id, Show.artist_id),
+}
+
+# owner model -> response cache namespace of its detail page
+PAGE_NAMESPACES = {
+    Venue: 'venue:{}',
+    Artist: 'artist:{}',
+}
+
+def compute_show_stats(model, ids, now):
+    # fresh stats rows for the given owners, straight from `show`
+    stats_model, key, owner = STATS[model]
+    rows = db.session.query(
+        model.id,
+        db.func.count(Show.id).filter(Show.start_time > now),
+        db.func.count(Show.id).filter(Show.start_time <= now),
+        db.func.min(Show.start_time).filter(Show.start_time > now),
+        db.func.max(Show.start_time).filter(Show.start_time <= now)
+    ).outerjoin(Show, owner == model.id).filter(model.id.in_(ids)).group_by(model.id)
+    refreshed_at = datetime.utcnow()
+    return [{
+        key.key: owner_id,
+        'upcoming_shows': upcoming,
+        'past_shows': past,
+        'next_show_at': next_show_at,
+        'last_show_at': last_show_at,
+        'refreshed_at': refreshed_at,
+    } for owner_id, upcoming, past, next_show_at, last_show_at in rows]
+
+# dialect -> INSERT construct with ON CONFLICT support
+UPSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def upsert_show_stats(stats_model, key, rows):
+    table = stats_model.__table__
+    statement = UPSERTS[db.engine.dialect.name](table).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[key.name],
+        set_={column: statement.excluded[column] for column in rows[0] if column != key.name}))
+
+def refresh_show_stats(model, ids, now=None):
+    # upsert the rows of these owners (dropping those of deleted owners);
+    # runs in the caller's transaction
+    ids = list(set(ids))
+    if not ids:
+        return
+    now = now or datetime.now()
+    stats_model, key, _ = STATS[model]
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        rows = compute_show_stats(model, chunk, now)
+        if rows:
+            upsert_show_stats(stats_model, key, rows)
+        gone = set(chunk) - {row[key.key] for row in rows}
+        if gone:
+            db.session.execute(stats_model.__table__.delete().where(key.in_(gone)))
+
+def record_show(venue_id, artist_id, start_time, now=None):
+    # count one new (already flushed) show for its venue and artist
+    now = now or datetime.now()
+    for model, owner_id in ((Venue, venue_id), (Artist, artist_id)):
+        stats_model, key, _ = STATS[model]
+        if start_time > now:
+            values = {
+                'upcoming_shows': stats_model.upcoming_shows + 1,
+                'next_show_at': db.case(
+                    (db.or_(stats_model.next_show_at.is_(None), stats_model.next_show_at > start_time), start_time),
+                    else_=stats_model.next_show_at),
+            }
+        else:
+            values = {
+                'past_shows': stats_model.past_shows + 1,
+                'last_show_at': db.case(
+                    (db.or_(stats_model.last_show_at.is_(None), stats_model.last_show_at < start_time), start_time),
+                    else_=stats_model.last_show_at),
+            }
+        values['refreshed_at'] = datetime.utcnow()
+        updated = db.session.query(stats_model).filter(key == owner_id).update(
+            values, synchronize_session=False)
+        if not updated:
+            refresh_show_stats(model, [owner_id], now)
+
+def refresh_stale(model, now, ids=None):
+    # recompute rows whose next show has started since they were written,
+    # and drop the cached pages that rendered the old counts
+    stats_model, key, _ = STATS[model]
+    query = db.session.query(key).filter(stats_model.next_show_at <= now)
+    if ids is not None:
+        query = query.filter(key.in_(ids))
+    stale = [owner_id for owner_id, in query]
+    if not stale:
+        return stale
+    refresh_show_stats(model, stale, now)
+    db.session.commit()
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is not None:
+        # /shows lists upcoming shows, and one of these has started
+        namespaces = [PAGE_NAMESPACES[model].format(owner_id) for owner_id in stale] + ['shows']
+        if model is Venue:
+            namespaces.append('venues')
+        response_cache.invalidate(*namespaces)
+    return stale
+
+def owner_stats(model, owner_id, now):
+    # the current stats row of one venue or artist, recomputed if missing
+    # or stale
+    stats_model, key, _ = STATS[model]
+    row = db.session.query(stats_model).filter(key == owner_id).first()
+    if row is None or (row.next_show_at is not None and row.next_show_at <= now):
+        refresh_show_stats(model, [owner_id], now)
+        db.session.commit()
+        row = db.session.query(stats_model).filter(key == owner_id).first()
+    return row
+
+def reconcile_show_stats(model, chunk_size=5000):
+    # recompute every row, walking owner ids in chunks; returns the count
+    now = datetime.now()
+    stats_model, key, _ = STATS[model]
+    last_id = 0
+    total = 0
+    while True:
+        ids = [owner_id for owner_id, in db.session.query(model.id).filter(
+            model.id > last_id).order_by(model.id).limit(chunk_size)]
+        if not ids:
+            break
+        refresh_show_stats(model, ids, now)
+        db.session.commit()
+        total += len(ids)
+        last_id = ids[-1]
+    # rows left behind by owners deleted outside the app
+    db.session.execute(stats_model.__table__.delete().where(
+        ~key.in_(db.session.query(model.id))))
+    db.session.commit()
+    return total
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+stats_cli = AppGroup('stats', help='Maintain the denormalized show statistics.')
+
+@stats_cli.command('reconcile', help='Recompute the show statistics of every venue and artist.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Owners recomputed per transaction.')
+def reconcile_cli(chunk_size):
+    for name, model in (('venues', Venue), ('artists', Artist)):
+        click.echo(f'{name}: {reconcile_show_stats(model, chunk_size)} reconciled')
+    # detail pages pick up the new counts as their cache entries expire
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is not None:
+        response_cache.invalidate('venues')
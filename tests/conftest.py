@@ -0,0 +1,74 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import create_app
+from models import db
+
+# PostgreSQL-only tests (query plans) run against this database; every
+# table in it is dropped before and after them
+POSTGRES_URL = os.environ.get('FYYUR_TEST_DATABASE_URL', '')
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+def make_app(database_url, **overrides):
+    # the settings from config.py against another database; nothing is
+    # warmed up, so no query runs before the test's own, and any lazy load
+    # a query did not ask for raises
+    settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+    settings.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=database_url,
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        WARM_STARTUP=False,
+        STRICT_LOADING=True,
+        JINJA_BYTECODE_CACHE=False,
+        **overrides)
+    return create_app(SimpleNamespace(**settings))
+
+# SQLite has no ARRAY type; store genres as JSON there (PostgreSQL still
+# gets ARRAY from the model)
+for table in db.metadata.tables.values():
+    for column in table.columns:
+        if isinstance(column.type, db.ARRAY):
+            column.type = column.type.with_variant(db.JSON(), 'sqlite')
+
+@pytest.fixture
+def app_settings():
+    # config overrides for the app fixture; modules that test caching
+    # override this fixture. By default every request renders: no cached
+    # pages or fragments
+    return {'CACHE_ENABLED': False}
+
+@pytest.fixture
+def app(tmp_path, app_settings):
+    app = make_app(f'sqlite:///{tmp_path}/fyyur.db', **app_settings)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def pg_app():
+    if not POSTGRES_URL.startswith('postgresql'):
+        pytest.skip('set FYYUR_TEST_DATABASE_URL to a PostgreSQL database')
+    app = make_app(POSTGRES_URL, CACHE_ENABLED=False)
+    with app.app_context():
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
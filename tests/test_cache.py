@@ -0,0 +1,127 @@
+from fnmatch import fnmatch
+
+import pytest
+from flask import Flask
+
+from cache import MemoryBackend, RedisBackend, ResponseCache
+from models import db, Venue
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def app_settings():
+    return {'CACHE_ENABLED': True, 'CACHE_BACKEND': 'memory'}
+
+def add_venue(name):
+    venue = Venue(name=name, city='Springfield', state='IL', genres=['Jazz'])
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+def get_page(client, venue_id):
+    # the first request writes the venue's show stats row, which is part of
+    # the page's ETag; pages are compared from the second request on
+    client.get(f'/venues/{venue_id}')
+    return client.get(f'/venues/{venue_id}')
+
+def rename_elsewhere(venue_id, name):
+    # a write made through another worker: the row changes, but this
+    # worker's cache generations are never bumped
+    db.session.execute(db.update(Venue).where(Venue.id == venue_id).values(name=name))
+    db.session.commit()
+
+def test_cached_page_is_served_until_the_page_changes(client):
+    venue_id = add_venue('The Musical Hop')
+    first = get_page(client, venue_id)
+    second = client.get(f'/venues/{venue_id}')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_etag() == first.get_etag()
+
+def test_write_from_another_worker_misses_the_cached_page(client):
+    venue_id = add_venue('The Musical Hop')
+    old = get_page(client, venue_id)
+    assert client.get(f'/venues/{venue_id}').headers['X-Cache'] == 'HIT'
+
+    rename_elsewhere(venue_id, 'Park Square Live')
+    new = client.get(f'/venues/{venue_id}')
+    assert new.headers['X-Cache'] == 'MISS'
+    assert new.get_etag() != old.get_etag()
+    assert 'Park Square Live' in new.get_data(as_text=True)
+    assert 'The Musical Hop' not in new.get_data(as_text=True)
+
+    # revalidating with the new ETag confirms the new body, never the old one
+    etag, _ = new.get_etag()
+    assert client.get(f'/venues/{venue_id}', headers={'If-None-Match': f'W/"{etag}"'}).status_code == 304
+    assert 'Park Square Live' in client.get(f'/venues/{venue_id}').get_data(as_text=True)
+
+#----------------------------------------------------------------------------#
+# Shared backend.
+#----------------------------------------------------------------------------#
+
+class FakeRedis:
+    # the part of the redis-py client RedisBackend uses, over one dict that
+    # every "worker" shares; values come back as bytes, as from redis
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.data) if fnmatch(key, pattern)]
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+def make_worker(backend):
+    # one worker process: its own Flask app and ResponseCache over `backend`
+    worker = Flask(__name__)
+    worker.config.update(CACHE_ENABLED=True, CACHE_BACKEND='memory', SECRET_KEY='test')
+    cache = ResponseCache(worker)
+    cache.backend = backend
+    renders = []
+
+    @worker.route('/venues')
+    @cache.cached('venues')
+    def venues():
+        renders.append(1)
+        return f'render {len(renders)}'
+
+    return worker.test_client(), cache
+
+def test_shared_backend_invalidates_every_worker():
+    store = FakeRedis()
+    first, first_cache = make_worker(RedisBackend(store))
+    second, second_cache = make_worker(RedisBackend(store))
+
+    assert first.get('/venues').headers['X-Cache'] == 'MISS'
+    # the other worker is served the entry the first one stored
+    response = second.get('/venues')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.get_data(as_text=True) == 'render 1'
+
+    # a write handled by the second worker bumps the shared generation
+    second_cache.invalidate('venues')
+    assert first.get('/venues').headers['X-Cache'] == 'MISS'
+    assert second.get('/venues').headers['X-Cache'] == 'HIT'
+
+def test_memory_backend_invalidates_only_its_own_worker():
+    # why multi-worker deployments need CACHE_BACKEND=redis (or, for pages
+    # under @conditional_get, the ETag in the key)
+    first, first_cache = make_worker(MemoryBackend())
+    second, second_cache = make_worker(MemoryBackend())
+    first.get('/venues')
+    second.get('/venues')
+
+    second_cache.invalidate('venues')
+    assert second.get('/venues').headers['X-Cache'] == 'MISS'
+    assert first.get('/venues').headers['X-Cache'] == 'HIT'
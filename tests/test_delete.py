@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import helpers
+from helpers import delete_shows
+from models import db, Artist, Show, Venue
+from stats import STATS, compute_show_stats, refresh_show_stats
+
+#----------------------------------------------------------------------------#
+# Venue and artist deletes.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def app_settings():
+    # one show per chunk, so a venue's shows take several transactions
+    return {'CACHE_ENABLED': False, 'DELETE_CHUNK_SIZE': 1}
+
+@pytest.fixture
+def catalog(app):
+    # venue 1 has three shows by two artists; artist 1 also plays venue 2
+    venues = [Venue(name=name, city='Springfield', state='IL', genres=['Jazz'])
+              for name in ('The Musical Hop', 'Park Square Live')]
+    artists = [Artist(name=name, city='Springfield', state='IL', genres=['Jazz'])
+               for name in ('Guns N Petals', 'Matt Quevedo')]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+    start = datetime.now() + timedelta(days=1)
+    db.session.add_all(Show(venue_id=venues[venue].id, artist_id=artists[artist].id,
+                            start_time=start + timedelta(days=day))
+                       for day, (venue, artist) in enumerate([(0, 0), (0, 1), (0, 1), (1, 0)]))
+    db.session.flush()
+    refresh_show_stats(Venue, [venue.id for venue in venues])
+    refresh_show_stats(Artist, [artist.id for artist in artists])
+    db.session.commit()
+    return [venue.id for venue in venues], [artist.id for artist in artists]
+
+def stats_rows(model):
+    # {owner id: (upcoming, past, next show, last show)} as stored
+    stats_model, key, _ = STATS[model]
+    return {row[0]: tuple(row[1:]) for row in db.session.query(
+        key, stats_model.upcoming_shows, stats_model.past_shows,
+        stats_model.next_show_at, stats_model.last_show_at)}
+
+def fresh_stats(model):
+    # the same, recomputed from `show`
+    ids = [owner_id for owner_id, in db.session.query(model.id)]
+    _, key, _ = STATS[model]
+    return {row[key.key]: (row['upcoming_shows'], row['past_shows'], row['next_show_at'], row['last_show_at'])
+            for row in compute_show_stats(model, ids, datetime.now())}
+
+def test_failed_delete_leaves_correct_stats_and_can_be_retried(client, catalog, monkeypatch):
+    (venue_id, _), _ = catalog
+    calls = []
+
+    def fail_second_chunk(model, ids, now=None):
+        # each chunk refreshes its artists, then the venue
+        calls.append(model)
+        if len(calls) == 3:
+            raise RuntimeError('connection lost')
+        refresh_show_stats(model, ids, now)
+
+    monkeypatch.setattr(helpers, 'refresh_show_stats', fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        delete_shows(Venue, venue_id)
+    db.session.rollback()
+    monkeypatch.undo()
+
+    # the first chunk is gone, with every count it touched up to date
+    assert db.session.query(Show).filter(Show.venue_id == venue_id).count() == 2
+    assert stats_rows(Venue) == fresh_stats(Venue)
+    assert stats_rows(Artist) == fresh_stats(Artist)
+
+    client.post(f'/venues/{venue_id}/delete')
+    assert db.session.query(Venue).get(venue_id) is None
+    assert db.session.query(Show).filter(Show.venue_id == venue_id).count() == 0
+    assert stats_rows(Artist) == fresh_stats(Artist)
+    assert venue_id not in stats_rows(Venue)
+
+def test_artist_delete_updates_venue_stats(client, catalog):
+    (venue_id, other_venue_id), (artist_id, _) = catalog
+    client.post(f'/artists/{artist_id}/delete')
+    assert db.session.query(Artist).get(artist_id) is None
+    assert stats_rows(Venue) == fresh_stats(Venue)
+    assert stats_rows(Venue)[venue_id][0] == 2
+    assert stats_rows(Venue)[other_venue_id][0] == 0
+    assert artist_id not in stats_rows(Artist)
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from models import db, load_shows, Artist, Show, Venue
+
+#----------------------------------------------------------------------------#
+# Strict loading.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def show_id(app):
+    venue = Venue(name='The Musical Hop', city='Springfield', state='IL', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='Springfield', state='IL', genres=['Rock n Roll'])
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=1))
+    db.session.add(show)
+    db.session.commit()
+    show_id = show.id
+    # start from an empty identity map, as a request does
+    db.session.expunge_all()
+    return show_id
+
+def test_unrequested_lazy_load_raises(show_id):
+    show = Show.query.get(show_id)
+    with pytest.raises(InvalidRequestError):
+        show.artist
+    venue = Venue.query.get(show.venue_id)
+    with pytest.raises(InvalidRequestError):
+        venue.shows
+
+def test_noload_raises(show_id):
+    venue_id = Show.query.get(show_id).venue_id
+    venue = Venue.query.options(load_shows(Venue, 'noload')).get(venue_id)
+    with pytest.raises(InvalidRequestError):
+        venue.shows
+
+def test_requested_loads_are_allowed(show_id):
+    venue_id = Show.query.get(show_id).venue_id
+    venue = Venue.query.options(load_shows(Venue, 'selectin')).get(venue_id)
+    assert [show.id for show in venue.shows] == [show_id]
+
+def test_lazy_loads_work_outside_strict_mode(app, show_id):
+    app.config['STRICT_LOADING'] = False
+    assert Show.query.get(show_id).artist.name == 'Guns N Petals'
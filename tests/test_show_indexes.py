@@ -0,0 +1,70 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from artists import ARTIST_SHOW_COLUMNS
+from helpers import show_page_query
+from models import db, Artist, Show, Venue
+from seed import seed_catalog
+from shows import SHOW_LISTING_COLUMNS, show_listing
+from venues import VENUE_SHOW_COLUMNS
+
+#----------------------------------------------------------------------------#
+# Query plans (PostgreSQL only).
+#----------------------------------------------------------------------------#
+
+# The plans are taken from the queries the views run (their own column
+# lists through show_page_query and show_listing). The detail pages must be
+# index-only on the show side: every show column they read is in the
+# per-owner indexes (migration 3e1f7a2c9d84).
+
+# enough rows that a sequential scan and sort would cost more than walking
+# the (owner, start_time) and (start_time, id) indexes of migration 6c758460782b
+SEED_SHOWS = 20000
+
+@pytest.fixture(scope='module')
+def catalog(pg_app):
+    seed_catalog(SEED_SHOWS)
+    db.session.commit()
+    # statistics for the planner, and a visibility map for index-only scans
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('VACUUM ANALYZE')
+    return db.session.query(Show.venue_id, Show.artist_id).first()
+
+def plan(query):
+    # EXPLAIN with the query's own bound parameters
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    result = db.session.connection().exec_driver_sql(f'EXPLAIN {compiled}', compiled.params)
+    return '\n'.join(line for line, in result)
+
+def assert_index_scan(query, index, only=False):
+    query_plan = plan(query)
+    scan = 'Index Only Scan' if only else 'Index (Only )?Scan'
+    assert re.search(rf'{scan} (Backward )?using {index}\b', query_plan), query_plan
+
+@pytest.mark.parametrize('upcoming', [True, False], ids=['upcoming', 'past'])
+def test_venue_page_uses_venue_index(pg_app, catalog, upcoming):
+    venue_id, _ = catalog
+    with pg_app.test_request_context(f'/venues/{venue_id}'):
+        for columns in (VENUE_SHOW_COLUMNS, (Show.updated_at, Artist.updated_at)):
+            assert_index_scan(show_page_query(columns, Artist, Show.venue_id == venue_id, datetime.now(), upcoming, 1),
+                              'ix_show_venue_id_start_time', only=True)
+
+@pytest.mark.parametrize('upcoming', [True, False], ids=['upcoming', 'past'])
+def test_artist_page_uses_artist_index(pg_app, catalog, upcoming):
+    _, artist_id = catalog
+    with pg_app.test_request_context(f'/artists/{artist_id}'):
+        for columns in (ARTIST_SHOW_COLUMNS, (Show.updated_at, Venue.updated_at)):
+            assert_index_scan(show_page_query(columns, Venue, Show.artist_id == artist_id, datetime.now(), upcoming, 1),
+                              'ix_show_artist_id_start_time', only=True)
+
+@pytest.mark.parametrize('args', [{}, {'scope': 'all'}, {'scope': 'all', 'after': 365}],
+                         ids=['upcoming', 'all', 'after-cursor'])
+def test_shows_keyset_uses_start_time_index(pg_app, catalog, args):
+    if 'after' in args:
+        # a page a year into the seeded history
+        args = dict(args, after=f'{datetime.now() - timedelta(days=args["after"]):%Y-%m-%dT%H:%M:%S},1')
+    with pg_app.test_request_context('/shows', query_string=args):
+        query, _, _ = show_listing(*SHOW_LISTING_COLUMNS)
+        assert_index_scan(query, 'ix_show_start_time_id')
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Artist, Show, Venue
+
+#----------------------------------------------------------------------------#
+# Show creation.
+#----------------------------------------------------------------------------#
+
+START = (datetime.now() + timedelta(days=7)).replace(hour=20, minute=0, second=0, microsecond=0)
+
+@pytest.fixture
+def catalog(app):
+    # venue 1 already has show 1 at START
+    venue = Venue(name='The Musical Hop', city='Springfield', state='IL', genres=['Jazz'])
+    other_venue = Venue(name='Park Square Live', city='Springfield', state='MO', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='Springfield', state='IL', genres=['Rock n Roll'])
+    db.session.add_all([venue, other_venue, artist])
+    db.session.flush()
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=START)
+    db.session.add(show)
+    db.session.commit()
+    return venue.id, other_venue.id, artist.id, show.id
+
+def show_count():
+    return db.session.query(Show).count()
+
+def post_show(client, artist_id, venue_id, start_time):
+    return client.post('/shows/create', data={
+        'artist_id': artist_id,
+        'venue_id': venue_id,
+        'start_time': f'{start_time:%Y-%m-%d %H:%M:%S}',
+    }).get_data(as_text=True)
+
+def post_batch(client, *lines):
+    return client.post('/shows/create/batch', data={
+        'shows': '\n'.join(f'{artist_id}, {venue_id}, {start_time:%Y-%m-%d %H:%M}'
+                           for artist_id, venue_id, start_time in lines),
+    }).get_data(as_text=True)
+
+def test_single_show_is_listed(client, catalog):
+    venue_id, other_venue_id, artist_id, _ = catalog
+    html = post_show(client, artist_id, other_venue_id, START)
+    assert 'Show was successfully listed!' in html
+    assert show_count() == 2
+
+def test_single_show_rejects_booked_venue(client, catalog):
+    venue_id, _, artist_id, show_id = catalog
+    html = post_show(client, artist_id, venue_id, START)
+    assert f'venue {venue_id} already has show {show_id} at {START}' in html
+    assert show_count() == 1
+
+def test_single_show_rejects_unknown_artist_and_venue(client, catalog):
+    html = post_show(client, 9999, 8888, START)
+    assert 'there is no artist 9999' in html
+    assert 'there is no venue 8888' in html
+    assert show_count() == 1
+
+def test_batch_is_listed(client, catalog):
+    venue_id, other_venue_id, artist_id, _ = catalog
+    html = post_batch(client,
+                      (artist_id, other_venue_id, START),
+                      (artist_id, venue_id, START + timedelta(days=1)))
+    assert '2 shows were successfully listed!' in html
+    assert show_count() == 3
+
+def test_batch_rejects_booked_venue(client, catalog):
+    venue_id, other_venue_id, artist_id, show_id = catalog
+    html = post_batch(client,
+                      (artist_id, other_venue_id, START),
+                      (artist_id, venue_id, START))
+    assert f'line 2: venue {venue_id} already has show {show_id} at {START}' in html
+    assert 'line 1:' not in html
+    assert show_count() == 1
+
+def test_batch_rejects_duplicates_within_the_batch(client, catalog):
+    _, other_venue_id, artist_id, _ = catalog
+    html = post_batch(client,
+                      (artist_id, other_venue_id, START),
+                      (artist_id, other_venue_id, START))
+    assert f'line 2: venue {other_venue_id} is already booked at {START} on line 1' in html
+    assert show_count() == 1
@@ -0,0 +1,28 @@
+import os
+import statistics
+
+from bench import import_times
+
+#----------------------------------------------------------------------------#
+# Startup.
+#----------------------------------------------------------------------------#
+
+# `-X importtime` in fresh processes, as `flask bench-startup` measures it.
+# What a web worker runs: import the app and build it outside the flask CLI
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_BOOT = 'import app; app.create_app()'
+
+# modules only the CLI commands or the rare string dates need
+LAZY_MODULES = ('bench', 'importer', 'exporter', 'seed', 'flask_migrate', 'alembic', 'dateutil')
+
+# median `import app` time; generous so slow CI machines pass, but it
+# catches an eager import of alembic or the CLI modules coming back
+IMPORT_BUDGET_MS = float(os.environ.get('FYYUR_IMPORT_BUDGET_MS', 1000))
+
+def test_worker_boot_skips_lazy_modules():
+    imported = import_times(ROOT, WORKER_BOOT)
+    assert [module for module in LAZY_MODULES if module in imported] == []
+
+def test_import_app_within_budget():
+    total_ms = statistics.median(import_times(ROOT)['app'][1] for _ in range(3)) / 1000
+    assert total_ms <= IMPORT_BUDGET_MS, f'import app took {total_ms:.1f}ms, budget is {IMPORT_BUDGET_MS:.1f}ms'
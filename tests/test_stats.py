@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Artist, Show, Venue, VenueShowStats
+from stats import STATS, compute_show_stats, refresh_stale, upsert_show_stats
+
+#----------------------------------------------------------------------------#
+# Show statistics.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def app_settings():
+    return {'CACHE_ENABLED': True, 'CACHE_BACKEND': 'memory'}
+
+def add_show(start_time):
+    venue = Venue(name='The Musical Hop', city='Springfield', state='IL', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='Springfield', state='IL', genres=['Rock n Roll'])
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time))
+    db.session.commit()
+    return venue.id
+
+def test_refreshing_an_existing_row_updates_it(app):
+    # a concurrent reader inserted the row first; ours must not conflict
+    venue_id = add_show(datetime.now() + timedelta(days=1))
+    stats_model, key, _ = STATS[Venue]
+    for _ in range(2):
+        upsert_show_stats(stats_model, key, compute_show_stats(Venue, [venue_id], datetime.now()))
+    db.session.commit()
+    row = db.session.query(VenueShowStats).filter_by(venue_id=venue_id).one()
+    assert (row.upcoming_shows, row.past_shows) == (1, 0)
+
+def test_started_show_drops_cached_shows_page(client):
+    start_time = datetime.now() + timedelta(hours=1)
+    venue_id = add_show(start_time)
+    client.get(f'/venues/{venue_id}')
+    client.get('/shows')
+    assert client.get('/shows').headers['X-Cache'] == 'HIT'
+
+    # an hour later the show has started: its venue's stats row is stale
+    # and the next reader recomputes it
+    assert refresh_stale(Venue, start_time + timedelta(minutes=1)) == [venue_id]
+    assert client.get('/shows').headers['X-Cache'] == 'MISS'
+    row = db.session.query(VenueShowStats).filter_by(venue_id=venue_id).one()
+    assert (row.upcoming_shows, row.past_shows) == (0, 1)
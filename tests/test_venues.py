@@ -0,0 +1,43 @@
+from instrumentation import query_budget
+from models import db, Venue
+
+#----------------------------------------------------------------------------#
+# Venue listing.
+#----------------------------------------------------------------------------#
+
+# the validator's stale-stats check and ETag row, then the listing query: the
+# same three however many venues and areas
+VENUES_QUERY_BUDGET = 3
+
+def add_venues(*venues):
+    db.session.add_all(Venue(name=name, city=city, state=state, genres=['Jazz'])
+                       for name, city, state in venues)
+    db.session.commit()
+
+def test_venues_stays_within_query_budget(client):
+    add_venues(
+        ('The Musical Hop', 'Springfield', 'IL'),
+        ('Park Square Live', 'Springfield', 'IL'),
+        ('The Dueling Pianos Bar', 'Springfield', 'MO'),
+        ('Blue Note', 'Portland', 'OR'))
+    with query_budget(VENUES_QUERY_BUDGET):
+        response = client.get('/venues')
+    assert response.status_code == 200
+
+    add_venues(*((f'Venue {number}', 'Springfield', ('IL', 'MO')[number % 2]) for number in range(40)))
+    with query_budget(VENUES_QUERY_BUDGET):
+        response = client.get('/venues')
+    assert response.status_code == 200
+
+def test_venues_keeps_same_named_cities_apart(client):
+    add_venues(
+        ('The Musical Hop', 'Springfield', 'IL'),
+        ('Park Square Live', 'Springfield', 'IL'),
+        ('The Dueling Pianos Bar', 'Springfield', 'MO'))
+    html = client.get('/venues').get_data(as_text=True)
+    assert html.count('<h3>Springfield, IL</h3>') == 1
+    assert html.count('<h3>Springfield, MO</h3>') == 1
+    illinois, missouri = html.index('Springfield, IL'), html.index('Springfield, MO')
+    assert illinois < html.index('The Musical Hop') < missouri
+    assert illinois < html.index('Park Square Live') < missouri
+    assert missouri < html.index('The Dueling Pianos Bar')
@@ -0,0 +1,329 @@
+import hashlib
+import logging
+from datetime import datetime
+from itertools import groupby
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from extensions import name_index, response_cache
+from conditional import conditional_get
+from forms import FilterForm, VenueForm
+from helpers import delete_shows, last_modified, page_arg, page_count, page_stamps, show_page
+from models import db, Venue, Artist, Show, VenueShowStats, load_shows
+from search import catalog_filters, search
+from stats import owner_stats, refresh_show_stats, refresh_stale
+
+venues_bp = Blueprint('venues', __name__)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# the show tiles of the venue page; the show side is read from
+# ix_show_venue_id_start_time alone (see migration 3e1f7a2c9d84)
+VENUE_SHOW_COLUMNS = (
+  Show.id,
+  Show.artist_id,
+  Artist.name.label('artist_name'),
+  Artist.image_link.label('artist_image_link'),
+  Show.start_time,
+  # fragment keys of the tiles
+  Show.updated_at.label('show_updated_at'),
+  Artist.updated_at.label('artist_updated_at')
+)
+
+def played_artist_ids(venue_id):
+  return [artist_id for artist_id, in
+          db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+def venue_cache_keys(venue_id, artist_ids=None):
+  # cached pages that render this venue: the listings, its own page and
+  # the page of every artist that has played there
+  if artist_ids is None:
+    artist_ids = played_artist_ids(venue_id)
+  return ['venues', 'shows', f'venue:{venue_id}'] + [f'artist:{artist_id}' for artist_id in artist_ids]
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+def venue_validator(venue_id):
+  # cheap inputs only: the venue row, its show stats row (brought up to date
+  # if a show has started since it was written) and the shows on the
+  # requested pages, never the whole show history
+  now = datetime.now()
+  refresh_stale(Venue, now, ids=[venue_id])
+  row = db.session.query(
+    Venue.updated_at,
+    VenueShowStats.upcoming_shows,
+    VenueShowStats.past_shows,
+    VenueShowStats.next_show_at,
+    VenueShowStats.last_show_at,
+    VenueShowStats.refreshed_at
+  ).outerjoin(VenueShowStats, VenueShowStats.venue_id == Venue.id).filter(Venue.id == venue_id).first()
+  if row is None:
+    return None
+  show_updated_at, artist_updated_at = page_stamps(Artist, Show.venue_id == venue_id, now)
+  return tuple(row) + (show_updated_at, artist_updated_at), last_modified(
+    row[0], row[5], show_updated_at, artist_updated_at)
+
+def venues_validator():
+  # the listing renders upcoming show counts: bring stale stats rows up to
+  # date first, then every count change shows up in max(refreshed_at)
+  refresh_stale(Venue, datetime.now())
+  row = db.session.query(
+    db.session.query(db.func.count(Venue.id)).scalar_subquery(),
+    db.session.query(db.func.max(Venue.updated_at)).scalar_subquery(),
+    db.session.query(db.func.max(VenueShowStats.refreshed_at)).scalar_subquery()
+  ).one()
+  return tuple(row), last_modified(row[1], row[2])
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@venues_bp.route('/venues')
+@conditional_get(venues_validator)
+@response_cache.cached('venues')
+def venues():
+    # Single ordered query: every venue with its upcoming show count from
+    # venue_show_stats (venues without shows have no row yet), sorted so
+    # venues of the same city/state are adjacent; ?genre=, city, state and
+    # seeking narrow it down. venues_validator has already brought stale
+    # stats rows up to date
+    filters = FilterForm(request.args, meta={'csrf': False})
+    venue_rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.updated_at,
+        db.func.coalesce(VenueShowStats.upcoming_shows, 0).label('num_upcoming_shows')
+    ).outerjoin(
+        VenueShowStats, VenueShowStats.venue_id == Venue.id
+    ).filter(
+        *catalog_filters(Venue, filters)
+    ).order_by(
+        Venue.state, Venue.city, Venue.name
+    ).all()
+
+    # Define list to store collection of data we are about to receive
+    data = []
+
+    # per-row debug records are skipped entirely unless DEBUG is enabled
+    log_rows = current_app.logger.isEnabledFor(logging.DEBUG)
+
+    # group adjacent rows by their (city, state) area in a single pass
+    for (city, state), rows in groupby(venue_rows, key=lambda row: (row.city, row.state)):
+        area_venues = []
+        stamp = hashlib.sha1()
+        for row in rows:
+            if log_rows:
+                current_app.logger.debug('venue listing row id=%s area=%s/%s upcoming=%s',
+                                         row.id, city, state, row.num_upcoming_shows)
+            area_venues.append({
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.num_upcoming_shows
+            })
+            stamp.update(f'{row.id}:{row.updated_at}:{row.num_upcoming_shows},'.encode())
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': area_venues,
+            # fragment key: changes with the area's venues, their names and counts
+            'stamp': stamp.hexdigest()
+        })
+
+    # Return data list with updated information
+    return render_template('pages/venues.html', areas=data, filters=filters)
+
+@venues_bp.route('/venues/search', methods=['POST'])
+def search_venues():
+  # ranked, case-insensitive search over venue name, city, state and genres
+  # obtain search term
+  search_term = request.form.get("search_term", '')
+  page = max(request.form.get('page', 1, type=int), 1)
+  per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+  filters = FilterForm(request.form, meta={'csrf': False})
+  # obtain one ranked page of lightweight (id, name, city, state) rows
+  count, venue_query = search(Venue, search_term, per_page, (page - 1) * per_page,
+                              catalog_filters(Venue, filters))
+  # obtain response details
+  response={
+    "count": count,
+    "data": venue_query,
+    "page": page,
+    "pages": max((count + per_page - 1) // per_page, 1)
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                         filters=filters, search_endpoint='venues.search_venues')
+
+@venues_bp.route('/venues/<int:venue_id>')
+@conditional_get(venue_validator)
+@response_cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+    # counts come from venue_show_stats; read (and, if stale, refresh and
+    # commit) them before loading the venue so it is not expired
+    now = datetime.now()
+    stats = owner_stats(Venue, venue_id, now)
+    # Display the venue page with the given venue_id
+    venue = Venue.query.options(load_shows(Venue, 'noload')).get_or_404(venue_id)
+
+    # split past from upcoming shows in SQL against a single timestamp
+    owner_filter = Show.venue_id == venue_id
+    upcoming_count, past_count = stats.upcoming_shows, stats.past_shows
+    upcoming_page = page_arg('upcoming_page')
+    past_page = page_arg('past_page')
+    # object class to dict
+    venue_data = vars(venue)
+    venue_data['past_shows'] = show_page(VENUE_SHOW_COLUMNS, Artist, owner_filter, now, False, past_page)
+    venue_data['upcoming_shows'] = show_page(VENUE_SHOW_COLUMNS, Artist, owner_filter, now, True, upcoming_page)
+    venue_data['past_shows_count'] = past_count
+    venue_data['upcoming_shows_count'] = upcoming_count
+    venue_data['past_page'] = past_page
+    venue_data['upcoming_page'] = upcoming_page
+    venue_data['past_pages'] = page_count(past_count)
+    venue_data['upcoming_pages'] = page_count(upcoming_count)
+
+    return render_template('pages/show_venue.html', venue=venue_data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venues_bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@venues_bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # track insertion errors
+  insertion_error = False
+
+  # perform form validation
+  form = VenueForm(request.form, meta={'csrf': False})
+  try:
+    venue = Venue(
+      name=form.name.data,
+      city=form.city.data,
+      state=form.state.data,
+      address=form.address.data,
+      phone=form.phone.data,
+      genres=form.genres.data,
+      facebook_link=form.facebook_link.data,
+      image_link=form.image_link.data,
+      website=form.website_link.data,
+      seeking_talent=form.seeking_talent.data,
+      seeking_description=form.seeking_description.data
+    )
+
+    # insert validated form data as a new Venue record in the db
+    db.session.add(venue)
+    db.session.commit()
+    response_cache.invalidate('venues')
+    name_index.add(Venue, venue.id, venue.name)
+  except:
+    current_app.logger.exception('venue insert failed name=%s', form.name.data)
+    insertion_error = True
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  if not insertion_error:
+    # on successful db insert, flash success
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    return render_template('pages/home.html')
+  else:
+    # on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Venue ' + venue.name + ' could not be listed.')
+
+#  Delete Venue
+#  ----------------------------------------------------------------
+
+@venues_bp.route('/venues/<venue_id>/delete', methods=['POST'])
+def delete_venue(venue_id):
+  try:
+    current_venue = Venue.query.options(load_shows(Venue, 'noload')).get_or_404(venue_id)
+    venue_id = current_venue.id
+    artist_ids = played_artist_ids(venue_id)
+    cache_keys = venue_cache_keys(venue_id, artist_ids)
+    # shows go first, a chunk per transaction that also fixes the stats of
+    # its artists, so a failed delete can simply be retried; the venue
+    # row itself is then one DELETE, and ON DELETE CASCADE takes any show
+    # added meanwhile
+    delete_shows(Venue, venue_id)
+    db.session.delete(current_venue)
+    db.session.flush()
+    # its own stats row goes with it
+    refresh_show_stats(Venue, [venue_id])
+    db.session.commit()
+    response_cache.invalidate(*cache_keys)
+    name_index.remove(Venue, venue_id)
+    flash('The venue has been removed together with all of its shows.')
+    return render_template('pages/home.html')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+#  Update Venue
+#  ----------------------------------------------------------------
+
+@venues_bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  # obtain venue given venue_id
+  venue = Venue.query.options(load_shows(Venue, 'noload')).get_or_404(venue_id)
+  # populate form with values from venue with ID <venue_id>
+  form = VenueForm(obj=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@venues_bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # take values from the form submitted, and update existing
+ 
+  # track insertion errors
+  insertion_error = False
+
+  # perform form validation
+  form = VenueForm(request.form, meta={'csrf': False})
+  if not form.validate():
+    # if errors are found, flash error
+    flash(form.errors)
+  else:
+    # if form is validated, proceed. 
+    current_app.logger.debug('venue edit validated venue_id=%s', venue_id)
+    try:
+      # obtain venue
+      venue = Venue.query.options(load_shows(Venue, 'noload')).filter_by(id=venue_id).first()
+      # update details
+      venue.name = request.form.get("name")
+      venue.city = request.form.get("city")
+      venue.state = request.form.get("state")
+      venue.phone = request.form.get("phone")
+      venue.genres = request.form.getlist("genres")
+      venue.website = request.form.get("website_link")
+      venue.facebook_link = request.form.get("facebook_link")
+      venue.seeking_talent = True if request.form.get("seeking_talent") == 'y' else False
+      venue.seeking_description = request.form.get("seeking_description")
+      venue.image_link = request.form.get("image_link")
+
+      # commit changes
+      db.session.commit()
+      response_cache.invalidate(*venue_cache_keys(venue_id))
+      name_index.add(Venue, venue_id, venue.name)
+    except:
+      insertion_error = True
+      db.session.rollback()
+    finally:
+      db.session.close()
+
+    if not insertion_error:
+      # on successful db insert, flash success
+      flash('Venue ' + request.form['name'] + ' was successfully updated!')
+      return render_template('pages/home.html')
+    else:
+      # on unsuccessful db insert, flash an error instead.
+      flash('An error occurred. Venue ' + venue.name + ' could not be updated.')
+
+  return redirect(url_for('.show_venue', venue_id=venue_id))